@@ -1,14 +1,17 @@
 import streamlit as st
 import pandas as pd
 import datetime
-import json
-from pathlib import Path
 import base64
+import calendar
+import hashlib
 import io
+import uuid
+from itertools import islice
 from PIL import Image
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+from communityfix_store import ReportStore, SubmissionQueue, ISSUE_TYPES, PRIORITIES, STATUSES, MAX_PHOTO_BYTES, from_epoch
 
 # Page configuration
 st.set_page_config(
@@ -83,39 +86,54 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Initialize session state for data storage
-if 'reports' not in st.session_state:
-    st.session_state.reports = []
 if 'admin_logged_in' not in st.session_state:
     st.session_state.admin_logged_in = False
 if 'admin_password' not in st.session_state:
     st.session_state.admin_password = "admin123"  # Default password
+if 'report_form_token' not in st.session_state:
+    st.session_state.report_form_token = uuid.uuid4().hex
+
+@st.cache_resource
+def get_store():
+    """One report store per worker process, shared by all of its sessions"""
+    return ReportStore()
+
+@st.cache_resource
+def get_submission_queue():
+    """Background writer for citizen reports, shared by all sessions of this worker"""
+    return SubmissionQueue(get_store())
+
+store = get_store()
+submissions = get_submission_queue()
 
 # Data persistence functions
 def save_data_to_file():
-    """Save reports data to JSON file"""
+    """Save reports data, with the monthly counts recounted from the reports"""
     try:
-        data = {
-            'reports': st.session_state.reports,
-            'last_updated': datetime.datetime.now().isoformat()
-        }
-        with open('reports_data.json', 'w') as f:
-            json.dump(data, f, indent=2)
+        store.rebuild_analytics()
     except Exception as e:
         st.error(f"Error saving data: {e}")
 
 def load_data_from_file():
-    """Load reports data from JSON file"""
+    """Pick up reports written by this or any other worker since the last run"""
     try:
-        if Path('reports_data.json').exists():
-            with open('reports_data.json', 'r') as f:
-                data = json.load(f)
-                st.session_state.reports = data.get('reports', [])
+        store.refresh()
     except Exception as e:
         st.error(f"Error loading data: {e}")
+    st.session_state.reports = store.reports
 
 # Load data on startup
 load_data_from_file()
 
+# How often an open dashboard with auto-refresh on checks for changes (seconds)
+AUTO_REFRESH_SECONDS = 10
+
+# Comments shown per page of a report's thread
+COMMENTS_PER_PAGE = 10
+
+# Rows shown per page of the admin reports table
+TABLE_ROWS_PER_PAGE = 50
+
 # Sample emergency contacts
 EMERGENCY_CONTACTS = {
     "Barangay Hall": "123-4567",
@@ -134,21 +152,22 @@ TIPS = [
     "Graffiti: Document with photos for proper reporting"
 ]
 
-def save_report(name, contact, issue_type, location, description, photo=None):
-    """Save a new report to session state"""
-    report_id = len(st.session_state.reports) + 1
-    
-    # Handle photo upload
+def submission_token(name, contact, issue_type, location, description):
+    """Same form and same content give the same token, so a double tap is recognised"""
+    content = "\n".join([st.session_state.report_form_token, name, contact, issue_type, location, description])
+    return hashlib.sha256(content.encode()).hexdigest()
+
+def submit_report(token, name, contact, issue_type, location, description, photo=None):
+    """Queue a new report for saving; returns the SubmissionQueue.submit() outcome"""
+    # Handle photo upload; it is converted to base64 for storage in the background
     photo_data = None
     if photo is not None:
         try:
-            # Convert uploaded file to base64 for storage
-            photo_data = base64.b64encode(photo.read()).decode()
+            photo_data = photo.getvalue()
         except Exception as e:
             st.warning(f"Could not process photo: {e}")
     
     new_report = {
-        'id': report_id,
         'name': name,
         'contact': contact,
         'issue_type': issue_type,
@@ -158,39 +177,34 @@ def save_report(name, contact, issue_type, location, description, photo=None):
         'assigned_to': 'Not assigned',
         'date_reported': datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
         'comments': [],
-        'photo': photo_data,
         'priority': 'Medium'  # Default priority
     }
-    st.session_state.reports.append(new_report)
-    
-    # Save to file
-    save_data_to_file()
-    
-    return report_id
+    return submissions.submit(token, new_report, photo_data)
 
 def add_comment(report_id, comment_text, author="Admin"):
     """Add a comment to a report"""
-    for report in st.session_state.reports:
-        if report['id'] == report_id:
-            comment = {
-                'author': author,
-                'text': comment_text,
-                'timestamp': datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
-            }
-            report['comments'].append(comment)
-            break
-
-def create_progress_charts():
+    store.add_comment(report_id, comment_text, author)
+
+def comment_page(report_id, key):
+    """One page of a report's comments, newest first, with a page picker for long threads"""
+    total = store.comment_count(report_id)
+    pages = (total + COMMENTS_PER_PAGE - 1) // COMMENTS_PER_PAGE
+    page = 1
+    if pages > 1:
+        page = st.number_input(f"Comments page (of {pages})", min_value=1, max_value=pages, value=1, key=key)
+    stop = total - (page - 1) * COMMENTS_PER_PAGE
+    start = max(0, stop - COMMENTS_PER_PAGE)
+    if pages > 1:
+        st.caption(f"Showing {total - stop + 1}-{total - start} of {total} comments")
+    return list(reversed(store.comments(report_id, start, stop)))
+
+def create_progress_charts(aggregates):
     """Create various charts for progress tracking"""
-    if not st.session_state.reports:
+    if not aggregates.total:
         return None, None, None, None
     
-    # Convert reports to DataFrame for easier analysis
-    df = pd.DataFrame(st.session_state.reports)
-    df['date_reported'] = pd.to_datetime(df['date_reported'])
-    
     # 1. Status Distribution Pie Chart
-    status_counts = df['status'].value_counts()
+    status_counts = pd.Series(aggregates.status).sort_values(ascending=False)
     status_colors = {'Received': '#ffc107', 'In Progress': '#17a2b8', 'Resolved': '#28a745'}
     
     fig_pie = px.pie(
@@ -202,7 +216,7 @@ def create_progress_charts():
     fig_pie.update_traces(textposition='inside', textinfo='percent+label')
     
     # 2. Issue Type Bar Chart
-    issue_counts = df['issue_type'].value_counts()
+    issue_counts = pd.Series(aggregates.issue_counts()).sort_values(ascending=False)
     fig_bar = px.bar(
         x=issue_counts.index,
         y=issue_counts.values,
@@ -214,7 +228,7 @@ def create_progress_charts():
     fig_bar.update_layout(showlegend=False)
     
     # 3. Timeline Chart
-    df_daily = df.groupby(df['date_reported'].dt.date).size().reset_index(name='count')
+    df_daily = pd.DataFrame(sorted(aggregates.daily.items()), columns=['date_reported', 'count'])
     fig_timeline = px.line(
         df_daily,
         x='date_reported',
@@ -225,19 +239,23 @@ def create_progress_charts():
     fig_timeline.update_traces(line=dict(width=3))
     
     # 4. Resolution Time Analysis
-    resolved_reports = df[df['status'] == 'Resolved'].copy()
-    if not resolved_reports.empty:
+    if aggregates.resolved_at:
         # Calculate days to resolution (simplified - using current date as resolution date)
-        resolved_reports['days_to_resolution'] = (datetime.datetime.now() - resolved_reports['date_reported']).dt.days
-        avg_resolution_time = resolved_reports['days_to_resolution'].mean()
+        now = datetime.datetime.now()
+        resolved_reports = pd.DataFrame([((now - from_epoch(t)).days, n) for t, n in aggregates.resolved_at.items()],
+                                        columns=['days_to_resolution', 'count'])
+        avg_resolution_time = (resolved_reports['days_to_resolution'] * resolved_reports['count']).sum() / resolved_reports['count'].sum()
         
         fig_resolution = px.histogram(
             resolved_reports,
             x='days_to_resolution',
+            y='count',
+            histfunc='sum',
             title=f"Resolution Time Distribution (Avg: {avg_resolution_time:.1f} days)",
             labels={'days_to_resolution': 'Days to Resolution', 'count': 'Number of Reports'},
             nbins=10
         )
+        fig_resolution.update_layout(yaxis_title='Number of Reports')
     else:
         fig_resolution = None
     
@@ -313,20 +331,18 @@ def show_report_page():
             contact = st.text_input("Contact Number *", placeholder="09XXXXXXXXX", help="Include area code if applicable")
             issue_type = st.selectbox(
                 "Issue Type *",
-                ["Pothole", "Garbage Accumulation", "Broken Streetlight", 
-                 "Clogged Drainage", "Graffiti", "Damaged Road", "Water Leak", 
-                 "Noise Complaint", "Safety Hazard", "Other"]
+                ISSUE_TYPES
             )
             priority = st.selectbox(
                 "Priority Level",
-                ["Low", "Medium", "High", "Emergency"],
+                PRIORITIES,
                 help="Emergency: Immediate danger to life/property"
             )
         
         with col2:
             location = st.text_input("Location *", placeholder="Ex: Near Barangay Hall, Main Street")
             description = st.text_area("Description *", placeholder="Please describe the issue in detail...", height=100)
-            photo = st.file_uploader("Upload Photo (Optional)", type=['png', 'jpg', 'jpeg'], help="Maximum file size: 5MB")
+            photo = st.file_uploader("Upload Photo (Optional)", type=['png', 'jpg', 'jpeg'], help=f"Maximum file size: {MAX_PHOTO_BYTES // 2**20}MB")
             
             # Show photo preview if uploaded
             if photo is not None:
@@ -355,15 +371,51 @@ def show_report_page():
                 for error in errors:
                     st.error(error)
             else:
-                report_id = save_report(name, contact, issue_type, location, description, photo)
-                st.markdown(f"""
-                <div class="success-card">
-                    <h3>✅ Report Submitted Successfully!</h3>
-                    <p><strong>Report ID:</strong> #{report_id}</p>
-                    <p>Thank you for helping improve our community!</p>
-                </div>
-                """, unsafe_allow_html=True)
-                st.info("📞 You can check the status of your report by contacting Barangay Hall or logging in as admin.")
+                token = submission_token(name, contact, issue_type, location, description)
+                outcome = submit_report(token, name, contact, issue_type, location, description, photo)
+                if outcome == 'rate_limited':
+                    st.error("You have sent several reports from this contact number in the last few minutes. "
+                             "Please wait a while before sending another, or call Barangay Hall for urgent concerns.")
+                elif outcome == 'too_large':
+                    st.error(f"The photo is too large. Please upload one of at most {MAX_PHOTO_BYTES // 2**20}MB.")
+                elif outcome == 'busy':
+                    st.warning("We are receiving many reports right now. Please try submitting again in a minute.")
+                else:
+                    st.session_state.pending_submission = token
+    
+    if 'pending_submission' in st.session_state:
+        show_submission_status(st.session_state.pending_submission)
+
+def show_submission_status(token):
+    # Never wait for the writer here; the fragment below checks back every second
+    result = submissions.result(token)
+    if result is not None and result['status'] == 'queued':
+        show_pending_submission(token)
+        return
+    
+    del st.session_state.pending_submission
+    if result is None:
+        return
+    if result['status'] == 'saved':
+        # A new form: the same text sent again from this tab is a new report
+        st.session_state.report_form_token = uuid.uuid4().hex
+        st.markdown(f"""
+        <div class="success-card">
+            <h3>✅ Report Submitted Successfully!</h3>
+            <p><strong>Report ID:</strong> #{result['report_id']}</p>
+            <p>Thank you for helping improve our community!</p>
+        </div>
+        """, unsafe_allow_html=True)
+        st.info("📞 You can check the status of your report by contacting Barangay Hall or logging in as admin.")
+    else:
+        st.error(f"Sorry, your report could not be saved ({result['error']}). Please submit it again.")
+
+@st.fragment(run_every=1)
+def show_pending_submission(token):
+    result = submissions.result(token)
+    if result is None or result['status'] != 'queued':
+        st.rerun()
+    st.info("📨 Report received, processing... Your Report ID will appear here in a moment.")
 
 def show_contacts_page():
     st.title("📞 Emergency Contacts & Tips")
@@ -460,48 +512,118 @@ def show_contacts_page():
         if st.button("📝 Report Issue", use_container_width=True):
             st.info("Use the 'Report Issue' page to submit non-emergency problems")
 
+def get_aggregates():
+    """This session's dashboard counts, brought up to date from the store's change feed"""
+    aggregates = st.session_state.get('aggregates')
+    changes = store.changes_since(aggregates.seq) if aggregates is not None else None
+    if changes is None:
+        aggregates = st.session_state.aggregates = store.aggregates()
+    else:
+        for change in changes:
+            aggregates.apply(change)
+    return aggregates
+
+def show_auto_refresh_toggle(key):
+    """Opt-in live updates for a dashboard page"""
+    if st.toggle("🔄 Auto-refresh", key=key, help=f"Check for new reports and updates every {AUTO_REFRESH_SECONDS} seconds"):
+        watch_for_changes(get_aggregates().seq)
+
+@st.fragment(run_every=AUTO_REFRESH_SECONDS)
+def watch_for_changes(seq):
+    # Only a look at the journal while nothing changes; the page is redrawn
+    # (from the updated counts) once something does
+    store.refresh()
+    if store.seq != seq:
+        st.rerun()
+    st.caption(f"Live · checked at {datetime.datetime.now().strftime('%H:%M:%S')}")
+
+def summarize_reports(aggregates):
+    """Status counts and resolution figures shared by both dashboards"""
+    status_counts = aggregates.status
+    total_reports = aggregates.total
+    received = status_counts['Received']
+    in_progress = status_counts['In Progress']
+    resolved = status_counts['Resolved']
+    
+    # Calculate additional metrics
+    resolution_rate = (resolved / total_reports * 100) if total_reports > 0 else 0
+    avg_resolution_time = 0
+    if resolved > 0:
+        now = datetime.datetime.now()
+        total_days = sum([(now - from_epoch(reported_at)).days * n for reported_at, n in aggregates.resolved_at.items()])
+        avg_resolution_time = total_days / resolved
+    
+    return {
+        'total': total_reports,
+        'received': received,
+        'in_progress': in_progress,
+        'resolved': resolved,
+        'resolution_rate': resolution_rate,
+        'avg_resolution_time': avg_resolution_time
+    }
+
+def analyze_issue_types(aggregates):
+    """Per issue type totals by status"""
+    issue_analysis = {}
+    for (issue_type, status), count in aggregates.by_issue.items():
+        if issue_type not in issue_analysis:
+            issue_analysis[issue_type] = {'total': 0, 'resolved': 0, 'in_progress': 0, 'received': 0}
+        
+        issue_analysis[issue_type]['total'] += count
+        issue_analysis[issue_type][status.lower().replace(' ', '_')] += count
+    return issue_analysis
+
 def show_progress_dashboard():
     st.title("📊 Progress Dashboard")
     st.markdown("Track the progress of community reports and get insights into issue resolution")
+    show_auto_refresh_toggle('auto_refresh_progress')
     
-    if not st.session_state.reports:
+    reports = st.session_state.reports
+    if not reports:
         st.info("No reports available yet. Submit some reports to see progress tracking!")
         return
     
-    # Key Metrics Section
-    st.header("📈 Key Metrics")
+    # Each section below only depends on what it is given, so an interaction
+    # inside a fragment reruns that section alone. Counts and charts come
+    # from this session's aggregates, updated with just the latest changes.
+    aggregates = get_aggregates()
+    summary = summarize_reports(aggregates)
+    issue_analysis = analyze_issue_types(aggregates)
+    # Month by month counts for long-range views, whatever the size of the history
+    cube = store.analytics()
     
-    total_reports = len(st.session_state.reports)
-    received = len([r for r in st.session_state.reports if r['status'] == 'Received'])
-    in_progress = len([r for r in st.session_state.reports if r['status'] == 'In Progress'])
-    resolved = len([r for r in st.session_state.reports if r['status'] == 'Resolved'])
+    show_key_metrics(summary)
+    show_visual_analytics(aggregates)
+    show_recent_activity(reports)
+    show_issue_analysis(issue_analysis)
+    show_year_over_year(cube)
+    show_performance_insights(cube, summary)
+
+def show_key_metrics(summary):
+    st.header("📈 Key Metrics")
     
-    # Calculate additional metrics
-    resolution_rate = (resolved / total_reports * 100) if total_reports > 0 else 0
-    avg_resolution_time = 0
-    if resolved > 0:
-        resolved_reports = [r for r in st.session_state.reports if r['status'] == 'Resolved']
-        total_days = sum([(datetime.datetime.now() - datetime.datetime.strptime(r['date_reported'], "%Y-%m-%d %H:%M")).days for r in resolved_reports])
-        avg_resolution_time = total_days / resolved if resolved > 0 else 0
+    total_reports = summary['total']
+    received = summary['received']
+    in_progress = summary['in_progress']
     
     col1, col2, col3, col4, col5 = st.columns(5)
     
     with col1:
         st.metric("Total Reports", total_reports, delta=None)
     with col2:
-        st.metric("Resolution Rate", f"{resolution_rate:.1f}%", delta=f"{resolved} resolved")
+        st.metric("Resolution Rate", f"{summary['resolution_rate']:.1f}%", delta=f"{summary['resolved']} resolved")
     with col3:
-        st.metric("Avg Resolution Time", f"{avg_resolution_time:.1f} days", delta="from submission")
+        st.metric("Avg Resolution Time", f"{summary['avg_resolution_time']:.1f} days", delta="from submission")
     with col4:
         st.metric("In Progress", in_progress, delta=f"{in_progress/total_reports*100:.1f}%" if total_reports > 0 else "0%")
     with col5:
         st.metric("Pending", received, delta=f"{received/total_reports*100:.1f}%" if total_reports > 0 else "0%")
-    
-    # Charts Section
+
+def show_visual_analytics(aggregates):
     st.header("📊 Visual Analytics")
     
     # Create charts
-    fig_pie, fig_bar, fig_timeline, fig_resolution = create_progress_charts()
+    fig_pie, fig_bar, fig_timeline, fig_resolution = create_progress_charts(aggregates)
     
     if fig_pie and fig_bar and fig_timeline:
         # First row - Status and Issue Type
@@ -519,12 +641,13 @@ def show_progress_dashboard():
         # Third row - Resolution Time (if available)
         if fig_resolution:
             st.plotly_chart(fig_resolution, use_container_width=True)
-    
-    # Recent Activity Section
+
+@st.fragment
+def show_recent_activity(reports):
     st.header("🕒 Recent Activity")
     
     # Get recent reports (last 10)
-    recent_reports = sorted(st.session_state.reports, key=lambda x: x['date_reported'], reverse=True)[:10]
+    recent_reports = sorted(reports, key=lambda x: x.reported_at, reverse=True)[:10]
     
     for report in recent_reports:
         status_color = {
@@ -567,30 +690,20 @@ def show_progress_dashboard():
                             st.warning("Could not display photo")
                     
                     # Show comments
-                    if report.get('comments'):
+                    if store.comment_count(report['id']):
                         st.write("**Comments & Updates:**")
-                        for comment in reversed(report['comments']):
+                        for comment in comment_page(report['id'], f"comments_page_{report['id']}"):
                             st.write(f"💬 **{comment['author']}** ({comment['timestamp']}): {comment['text']}")
                     
                     if st.button(f"Close Details", key=f"close_{report['id']}"):
                         st.session_state[f"show_report_{report['id']}"] = False
-                        st.rerun()
+                        st.rerun(scope="fragment")
             
             st.divider()
-    
-    # Issue Type Analysis
+
+def show_issue_analysis(issue_analysis):
     st.header("🔍 Issue Analysis")
     
-    # Create issue type breakdown
-    issue_analysis = {}
-    for report in st.session_state.reports:
-        issue_type = report['issue_type']
-        if issue_type not in issue_analysis:
-            issue_analysis[issue_type] = {'total': 0, 'resolved': 0, 'in_progress': 0, 'received': 0}
-        
-        issue_analysis[issue_type]['total'] += 1
-        issue_analysis[issue_type][report['status'].lower().replace(' ', '_')] += 1
-    
     # Display issue analysis
     for issue_type, stats in issue_analysis.items():
         resolution_rate = (stats['resolved'] / stats['total'] * 100) if stats['total'] > 0 else 0
@@ -611,17 +724,81 @@ def show_progress_dashboard():
         st.progress(progress)
         st.write(f"Resolution Progress: {resolution_rate:.1f}%")
         st.divider()
+
+def year_over_year(cube, **filters):
+    """Reports, resolved reports and change from the year before, one row per year"""
+    years = {}
+    for (month, status), count in cube.totals('month', 'status', **filters).items():
+        year = years.setdefault(month[:4], {'Year': month[:4], 'Reports': 0, 'Resolved': 0})
+        year['Reports'] += count
+        if status == 'Resolved':
+            year['Resolved'] += count
+    
+    rows = []
+    previous = None
+    for year in sorted(years):
+        row = years[year]
+        row['Resolution Rate (%)'] = round(row['Resolved'] / row['Reports'] * 100, 1)
+        row['Change vs Previous Year (%)'] = round((row['Reports'] - previous) / previous * 100, 1) if previous else None
+        previous = row['Reports']
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+@st.fragment
+def show_year_over_year(cube):
+    st.header("📅 Year over Year")
+    
+    issue_filter = st.selectbox("Compare Issue Type", ["All"] + sorted(cube.totals('issue_type')), key="yoy_issue_filter")
+    filters = {} if issue_filter == "All" else {'issue_type': issue_filter}
     
-    # Performance Insights
+    monthly = cube.totals('month', **filters)
+    if not monthly:
+        st.info("No reports of this type yet.")
+        return
+    
+    df_monthly = pd.DataFrame([{'Year': month[:4], 'Month': int(month[5:]), 'Reports': count}
+                               for month, count in sorted(monthly.items())])
+    fig_yoy = px.line(
+        df_monthly,
+        x='Month',
+        y='Reports',
+        color='Year',
+        markers=True,
+        title="Reports per Month by Year",
+        labels={'Reports': 'Number of Reports'}
+    )
+    fig_yoy.update_xaxes(tickmode='array', tickvals=list(range(1, 13)), ticktext=list(calendar.month_abbr)[1:])
+    st.plotly_chart(fig_yoy, use_container_width=True)
+    
+    df_years = year_over_year(cube, **filters)
+    st.dataframe(df_years, use_container_width=True, hide_index=True)
+    st.caption(f"{datetime.datetime.now().year} is counted up to today.")
+    st.download_button(
+        label="📥 Download Year-over-Year CSV",
+        data=df_years.to_csv(index=False),
+        file_name=f"year_over_year_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+        mime="text/csv"
+    )
+
+def show_performance_insights(cube, summary):
     st.header("💡 Performance Insights")
     
+    resolution_rate = summary['resolution_rate']
+    avg_resolution_time = summary['avg_resolution_time']
+    
+    by_issue = cube.totals('issue_type')
+    resolved_by_issue = cube.totals('issue_type', status='Resolved')
+    by_month = cube.totals('month')
+    now = datetime.datetime.now()
+    
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("📊 Quick Stats")
-        st.write(f"• **Most Common Issue:** {max(issue_analysis.keys(), key=lambda x: issue_analysis[x]['total']) if issue_analysis else 'N/A'}")
-        st.write(f"• **Best Resolved Issue:** {max(issue_analysis.keys(), key=lambda x: issue_analysis[x]['resolved']/issue_analysis[x]['total'] if issue_analysis[x]['total'] > 0 else 0) if issue_analysis else 'N/A'}")
-        st.write(f"• **Total Reports This Month:** {len([r for r in st.session_state.reports if datetime.datetime.strptime(r['date_reported'], '%Y-%m-%d %H:%M').month == datetime.datetime.now().month])}")
+        st.write(f"• **Most Common Issue:** {max(by_issue, key=by_issue.get) if by_issue else 'N/A'}")
+        st.write(f"• **Best Resolved Issue:** {max(by_issue, key=lambda x: resolved_by_issue[x] / by_issue[x]) if by_issue else 'N/A'}")
+        st.write(f"• **Total Reports This Month:** {by_month[now.strftime('%Y-%m')]}")
+        st.write(f"• **Same Month Last Year:** {by_month[f'{now.year - 1}-{now.month:02d}']}")
     
     with col2:
         st.subheader("🎯 Recommendations")
@@ -656,213 +833,259 @@ def show_admin_login():
 
 def show_admin_dashboard():
     st.title("📊 Admin Dashboard")
+    show_auto_refresh_toggle('auto_refresh_admin')
     
-    # Statistics
-    total_reports = len(st.session_state.reports)
-    received = len([r for r in st.session_state.reports if r['status'] == 'Received'])
-    in_progress = len([r for r in st.session_state.reports if r['status'] == 'In Progress'])
-    resolved = len([r for r in st.session_state.reports if r['status'] == 'Resolved'])
+    reports = st.session_state.reports
     
-    # Calculate resolution rate
-    resolution_rate = (resolved / total_reports * 100) if total_reports > 0 else 0
+    # Statistics
+    aggregates = get_aggregates()
+    summary = summarize_reports(aggregates)
     
     col1, col2, col3, col4, col5 = st.columns(5)
     with col1:
         st.markdown(f"""
         <div class="metric-card">
             <h3>Total Reports</h3>
-            <h1>{total_reports}</h1>
+            <h1>{summary['total']}</h1>
         </div>
         """, unsafe_allow_html=True)
     with col2:
         st.markdown(f"""
         <div class="metric-card">
             <h3>Received</h3>
-            <h1>{received}</h1>
+            <h1>{summary['received']}</h1>
         </div>
         """, unsafe_allow_html=True)
     with col3:
         st.markdown(f"""
         <div class="metric-card">
             <h3>In Progress</h3>
-            <h1>{in_progress}</h1>
+            <h1>{summary['in_progress']}</h1>
         </div>
         """, unsafe_allow_html=True)
     with col4:
         st.markdown(f"""
         <div class="metric-card">
             <h3>Resolved</h3>
-            <h1>{resolved}</h1>
+            <h1>{summary['resolved']}</h1>
         </div>
         """, unsafe_allow_html=True)
     with col5:
         st.markdown(f"""
         <div class="metric-card">
             <h3>Resolution Rate</h3>
-            <h1>{resolution_rate:.1f}%</h1>
+            <h1>{summary['resolution_rate']:.1f}%</h1>
         </div>
         """, unsafe_allow_html=True)
     
     # Reports table with status management
     st.header("📋 All Reports")
     
-    if st.session_state.reports:
-        # Search and filter options
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            search_term = st.text_input("🔍 Search reports", placeholder="Search by location, issue type, or name")
-        
-        with col2:
-            status_filter = st.selectbox("Filter by Status", ["All", "Received", "In Progress", "Resolved"])
-        
-        with col3:
-            issue_filter = st.selectbox("Filter by Issue Type", ["All"] + list(set([r['issue_type'] for r in st.session_state.reports])))
-        
-        # Filter reports based on search and filters
-        filtered_reports = st.session_state.reports.copy()
-        
-        if search_term:
-            filtered_reports = [r for r in filtered_reports if 
-                              search_term.lower() in r['location'].lower() or 
-                              search_term.lower() in r['issue_type'].lower() or 
-                              search_term.lower() in r['name'].lower()]
-        
-        if status_filter != "All":
-            filtered_reports = [r for r in filtered_reports if r['status'] == status_filter]
-        
-        if issue_filter != "All":
-            filtered_reports = [r for r in filtered_reports if r['issue_type'] == issue_filter]
-        
-        # Create DataFrame for display
-        df_data = []
-        for report in filtered_reports:
-            df_data.append({
-                'ID': report['id'],
-                'Name': report['name'],
-                'Issue Type': report['issue_type'],
-                'Location': report['location'],
-                'Status': report['status'],
-                'Date Reported': report['date_reported'],
-                'Assigned To': report['assigned_to'],
-                'Priority': report.get('priority', 'Medium')
-            })
-        
-        if df_data:
-            df = pd.DataFrame(df_data)
-            st.dataframe(df, use_container_width=True)
-            
-            # Show filtered count
-            st.info(f"Showing {len(filtered_reports)} of {len(st.session_state.reports)} reports")
+    if reports:
+        # Searching, managing one report and exporting each rerun on their own
+        show_reports_table(list(aggregates.issue_counts()))
+        show_report_manager()
+        show_export_backup(reports)
+    
+    else:
+        st.info("No reports submitted yet.")
+
+def report_matches(report, search_term, status_filter, issue_filter):
+    """Whether a report passes the admin table's search and filters"""
+    if search_term and not (search_term in report['location'].lower() or
+                            search_term in report['issue_type'].lower() or
+                            search_term in report['name'].lower()):
+        return False
+    if status_filter != "All" and report['status'] != status_filter:
+        return False
+    if issue_filter != "All" and report['issue_type'] != issue_filter:
+        return False
+    return True
+
+def report_table_row(report):
+    return {
+        'ID': report['id'],
+        'Name': report['name'],
+        'Issue Type': report['issue_type'],
+        'Location': report['location'],
+        'Status': report['status'],
+        'Date Reported': report['date_reported'],
+        'Assigned To': report['assigned_to'],
+        'Priority': report.get('priority', 'Medium')
+    }
+
+@st.fragment
+def show_reports_table(issue_types):
+    # Search and filter options
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        search_term = st.text_input("🔍 Search reports", placeholder="Search by location, issue type, or name")
+    
+    with col2:
+        status_filter = st.selectbox("Filter by Status", ["All"] + STATUSES)
+    
+    with col3:
+        issue_filter = st.selectbox("Filter by Issue Type", ["All"] + issue_types)
+    
+    # IDs matching the search and filters are kept for this session and
+    # patched with the latest changes instead of filtering every report again;
+    # the rows themselves are built from the store's records when drawn
+    filters = (search_term.lower(), status_filter, issue_filter)
+    table = st.session_state.get('report_table')
+    changes = store.changes_since(table['seq']) if table is not None and table['filters'] == filters else None
+    if changes is None:
+        ids, seq = store.select(lambda report: report_matches(report, *filters))
+        table = st.session_state.report_table = {'filters': filters, 'seq': seq, 'ids': dict.fromkeys(ids)}
+    else:
+        for change in changes:
+            if change['op'] == 'put':
+                if report_matches(store.get(change['id']), *filters):
+                    table['ids'].setdefault(change['id'])
+                else:
+                    table['ids'].pop(change['id'], None)
+            table['seq'] = change['seq']
+    
+    total = len(table['ids'])
+    if total:
+        # Only the page on screen is built and sent to the browser
+        pages = (total + TABLE_ROWS_PER_PAGE - 1) // TABLE_ROWS_PER_PAGE
+        page = 1
+        if pages > 1:
+            page = min(pages, st.number_input(f"Table page (of {pages})", min_value=1, max_value=pages, value=1))
+        start = (page - 1) * TABLE_ROWS_PER_PAGE
+        visible = islice(table['ids'], start, start + TABLE_ROWS_PER_PAGE)
+        df = pd.DataFrame([report_table_row(store.get(report_id)) for report_id in visible])
+        st.dataframe(df, use_container_width=True)
+    
+        # Show filtered count
+        if pages > 1:
+            st.info(f"Showing {start + 1}-{start + len(df)} of {total} matching reports ({len(store.reports)} in all)")
         else:
-            st.warning("No reports match your search criteria.")
-        
-        # Report management
-        st.header("🛠️ Manage Reports")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.subheader("Update Report Status")
-            report_id = st.selectbox("Select Report", 
-                                   [f"#{r['id']} - {r['issue_type']} - {r['location']}" 
-                                    for r in st.session_state.reports])
-            
-            selected_report = None
-            selected_id = None
-            
-            if report_id:
-                selected_id = int(report_id.split('#')[1].split(' - ')[0])
-                selected_report = next((r for r in st.session_state.reports if r['id'] == selected_id), None)
-                
-                if selected_report:
-                    # Display report details
-                    st.markdown(f"""
-                    <div class="report-card">
-                        <h4>Report #{selected_report['id']}</h4>
-                        <p><strong>Reporter:</strong> {selected_report['name']}</p>
-                        <p><strong>Contact:</strong> {selected_report['contact']}</p>
-                        <p><strong>Issue:</strong> {selected_report['issue_type']}</p>
-                        <p><strong>Location:</strong> {selected_report['location']}</p>
-                        <p><strong>Description:</strong> {selected_report['description']}</p>
-                        <p><strong>Date:</strong> {selected_report['date_reported']}</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    # Show photo if available
-                    if selected_report.get('photo'):
-                        try:
-                            photo_data = base64.b64decode(selected_report['photo'])
-                            st.image(photo_data, caption="Report Photo", use_column_width=True)
-                        except:
-                            st.warning("Could not display photo")
-                    
-                    new_status = st.selectbox("Update Status", 
-                                            ["Received", "In Progress", "Resolved"],
-                                            index=["Received", "In Progress", "Resolved"].index(selected_report['status']))
-                    assigned_to = st.text_input("Assign To", value=selected_report['assigned_to'])
-                    priority = st.selectbox("Priority", 
-                                          ["Low", "Medium", "High", "Emergency"],
-                                          index=["Low", "Medium", "High", "Emergency"].index(selected_report.get('priority', 'Medium')))
-                    
-                    if st.button("Update Report", use_container_width=True):
-                        selected_report['status'] = new_status
-                        selected_report['assigned_to'] = assigned_to
-                        selected_report['priority'] = priority
-                        save_data_to_file()  # Save changes
-                        st.success("Report updated successfully!")
-                        st.rerun()
-        
-        with col2:
-            st.subheader("Add Comment")
+            st.info(f"Showing {total} of {len(store.reports)} reports")
+    else:
+        st.warning("No reports match your search criteria.")
+
+def report_label(report_id):
+    report = store.get(report_id)
+    return f"#{report_id} - {report['issue_type']} - {report['location']}"
+
+@st.fragment
+def show_report_manager():
+    # Report management
+    st.header("🛠️ Manage Reports")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader("Update Report Status")
+        # Only the few reports matching what was typed are offered, newest first
+        query = st.text_input("Find Report", placeholder="Report ID, or words from a name, location or issue type")
+        candidates = store.search(query)
+        selected_id = st.selectbox("Select Report", [r.id for r in candidates], format_func=report_label)
+        if not candidates:
+            st.info("No report matches that ID or text.")
+    
+        selected_report = None
+    
+        if selected_id is not None:
+            selected_report = store.get(selected_id)
+    
             if selected_report:
-                comment = st.text_area("Add comment/update", placeholder="Enter your comment or status update...")
-                if st.button("Add Comment", use_container_width=True):
-                    if comment:
-                        add_comment(selected_id, comment)
-                        save_data_to_file()  # Save changes
-                        st.success("Comment added!")
-                        st.rerun()
-                    else:
-                        st.warning("Please enter a comment")
-        
-        # Display comments for selected report
-        if selected_report and selected_report['comments']:
-            st.subheader("💬 Comments & Updates")
-            for comment in reversed(selected_report['comments']):
-                with st.container():
-                    st.markdown(f"""
-                    <div class="report-card">
-                        <strong>{comment['author']}</strong> - <em>{comment['timestamp']}</em><br>
-                        {comment['text']}
-                    </div>
-                    """, unsafe_allow_html=True)
-        
-        # Export functionality
-        st.header("📊 Export & Backup")
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            if st.button("📥 Export Reports to CSV", use_container_width=True):
-                if st.session_state.reports:
-                    df_export = pd.DataFrame(st.session_state.reports)
-                    csv = df_export.to_csv(index=False)
-                    st.download_button(
-                        label="Download CSV",
-                        data=csv,
-                        file_name=f"reports_export_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                        mime="text/csv"
-                    )
+                # Display report details
+                st.markdown(f"""
+                <div class="report-card">
+                    <h4>Report #{selected_report['id']}</h4>
+                    <p><strong>Reporter:</strong> {selected_report['name']}</p>
+                    <p><strong>Contact:</strong> {selected_report['contact']}</p>
+                    <p><strong>Issue:</strong> {selected_report['issue_type']}</p>
+                    <p><strong>Location:</strong> {selected_report['location']}</p>
+                    <p><strong>Description:</strong> {selected_report['description']}</p>
+                    <p><strong>Date:</strong> {selected_report['date_reported']}</p>
+                </div>
+                """, unsafe_allow_html=True)
+    
+                # Show photo if available
+                if selected_report.get('photo'):
+                    try:
+                        photo_data = base64.b64decode(selected_report['photo'])
+                        st.image(photo_data, caption="Report Photo", use_column_width=True)
+                    except:
+                        st.warning("Could not display photo")
+    
+                new_status = st.selectbox("Update Status", 
+                                        STATUSES,
+                                        index=STATUSES.index(selected_report['status']))
+                assigned_to = st.text_input("Assign To", value=selected_report['assigned_to'])
+                priority = st.selectbox("Priority", 
+                                      PRIORITIES,
+                                      index=PRIORITIES.index(selected_report.get('priority', 'Medium')))
+    
+                if st.button("Update Report", use_container_width=True):
+                    store.update_report(selected_id, status=new_status,
+                                        assigned_to=assigned_to, priority=priority)
+                    st.success("Report updated successfully!")
+                    st.rerun()
+    
+    with col2:
+        st.subheader("Add Comment")
+        if selected_report:
+            comment = st.text_area("Add comment/update", placeholder="Enter your comment or status update...")
+            if st.button("Add Comment", use_container_width=True):
+                if comment:
+                    # The thread below reads the report's comments afresh, no rerun needed
+                    add_comment(selected_id, comment)
+                    st.success("Comment added!")
                 else:
-                    st.warning("No reports to export")
-        
-        with col2:
-            if st.button("💾 Backup Data", use_container_width=True):
-                save_data_to_file()
-                st.success("Data backed up successfully!")
+                    st.warning("Please enter a comment")
     
-    else:
-        st.info("No reports submitted yet.")
+    # Display comments for selected report
+    if selected_report and store.comment_count(selected_id):
+        st.subheader("💬 Comments & Updates")
+        for comment in comment_page(selected_id, f"manager_comments_page_{selected_id}"):
+            with st.container():
+                st.markdown(f"""
+                <div class="report-card">
+                    <strong>{comment['author']}</strong> - <em>{comment['timestamp']}</em><br>
+                    {comment['text']}
+                </div>
+                """, unsafe_allow_html=True)
+
+@st.fragment
+def show_export_backup(reports):
+    # Export functionality
+    st.header("📊 Export & Backup")
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        if st.button("📥 Export Reports to CSV", use_container_width=True):
+            if reports:
+                df_export = pd.DataFrame(store.export_rows())
+                csv = df_export.to_csv(index=False)
+                st.download_button(
+                    label="Download CSV",
+                    data=csv,
+                    file_name=f"reports_export_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                    mime="text/csv"
+                )
+            else:
+                st.warning("No reports to export")
+    
+    with col2:
+        if st.button("📥 Export Monthly Summary", use_container_width=True):
+            # Counts per month, issue type, priority and status, straight from the analytics cube
+            df_summary = pd.DataFrame(store.analytics().rows())
+            st.download_button(
+                label="Download Summary CSV",
+                data=df_summary.to_csv(index=False),
+                file_name=f"monthly_summary_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                mime="text/csv"
+            )
+    
+    with col3:
+        if st.button("💾 Backup Data", use_container_width=True):
+            save_data_to_file()
+            st.success("Data backed up successfully!")
 
 if __name__ == "__main__":
     main()
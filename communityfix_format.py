@@ -0,0 +1,124 @@
+"""On-disk format of the CommUnityFix data files.
+
+Snapshot files start with one text line naming the format, schema version
+and codec, followed by the encoded payload::
+
+    CFX 2 orjson
+    {"reports":[...],"seq":...}
+
+The codec is the fastest one installed: orjson, then msgpack, then the
+standard json module writing compact JSON. Any worker can read a file
+written with orjson or json; a msgpack file needs msgpack installed.
+
+Version 1 is the original reports_data.json (plain JSON, no header, each
+report carrying its description, comments and photo). Files are upgraded
+one version at a time by the functions in UPGRADES when they are read.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+SCHEMA_VERSION = 2
+
+MAGIC = b'CFX'
+
+# Fields moved out of the reports into their own files in version 2
+DETAIL_FIELDS = ('description', 'comments', 'photo')
+
+
+def _json_dumps(obj):
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+CODECS = {'json': (_json_dumps, json.loads)}
+if msgpack is not None:
+    CODECS['msgpack'] = (msgpack.packb, lambda data: msgpack.unpackb(data, strict_map_key=False))
+if orjson is not None:
+    CODECS['orjson'] = (orjson.dumps, orjson.loads)
+
+CODEC = 'orjson' if orjson is not None else 'msgpack' if msgpack is not None else 'json'
+
+
+# JSON text, used for journal lines and details files
+
+if orjson is not None:
+    def dumps_json(obj):
+        return orjson.dumps(obj)
+
+    loads_json = orjson.loads
+else:
+    dumps_json = _json_dumps
+    loads_json = json.loads
+
+
+# Snapshot files
+
+def encode(obj, codec=None):
+    """Payload with its header line, at the current schema version"""
+    codec = codec or CODEC
+    header = b'%s %d %s\n' % (MAGIC, SCHEMA_VERSION, codec.encode())
+    return header + CODECS[codec][0](obj)
+
+
+def decode(data):
+    """Decode a snapshot file of any version and upgrade it to the current one"""
+    if not data.startswith(MAGIC + b' '):
+        return upgrade(json.loads(data), 1)
+    header, _, payload = data.partition(b'\n')
+    _, version, codec = header.decode().split(' ')
+    if codec not in CODECS:
+        raise RuntimeError(f"This data file was written with {codec}; install it to read the file")
+    return upgrade(CODECS[codec][1](payload), int(version))
+
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return decode(f.read())
+
+
+def upgrade(data, version):
+    """Apply the upgrade steps from version to SCHEMA_VERSION"""
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"Data file schema {version} is newer than this app ({SCHEMA_VERSION}); please update")
+    while version < SCHEMA_VERSION:
+        data = UPGRADES[version](data)
+        version += 1
+    return data
+
+
+def _upgrade_1_to_2(data):
+    """Split description, comments and photo out of each report.
+
+    The split-out fields are returned under 'details' ({id: {...}}) for the
+    store to write to their own files.
+    """
+    reports, details = [], {}
+    for report in data.get('reports', []):
+        row = {k: v for k, v in report.items() if k not in DETAIL_FIELDS}
+        if any(k in report for k in DETAIL_FIELDS):
+            details[row['id']] = {
+                'description': report.get('description', ''),
+                'comments': report.get('comments', []),
+                'photo': report.get('photo')
+            }
+        reports.append(row)
+    return {
+        'reports': reports,
+        'details': details,
+        'seq': data.get('seq', 0),
+        'tokens': data.get('tokens', {}),
+        'last_updated': data.get('last_updated')
+    }
+
+
+UPGRADES = {
+    1: _upgrade_1_to_2
+}
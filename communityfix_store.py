@@ -0,0 +1,984 @@
+import base64
+import datetime
+import heapq
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, OrderedDict, deque
+from collections.abc import Mapping
+from contextlib import contextmanager
+from pathlib import Path
+
+import communityfix_format as fmt
+from communityfix_format import DETAIL_FIELDS, dumps_json, loads_json
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Compact the journal into the data file after this many mutations
+COMPACT_EVERY = 500
+
+# How many reports' description, comments and photo stay in memory
+DETAILS_CACHE_SIZE = 256
+
+# Most reports search() returns
+SEARCH_LIMIT = 20
+
+# What counts as a word for search()
+WORD = re.compile(r'\w+')
+
+# How many recent changes changes_since() can return
+FEED_SIZE = 1000
+
+# How many recent submission tokens are remembered for de-duplication
+TOKEN_MEMORY = 1000
+
+# Submissions waiting to be written before new ones are turned away
+INGEST_QUEUE_SIZE = 200
+
+# Photo bytes waiting to be written before new submissions are turned away
+INGEST_QUEUE_BYTES = 64 * 2**20
+
+# Largest photo accepted with a report, as the report form says
+MAX_PHOTO_BYTES = 5 * 2**20
+
+# At most this many reports per contact number within the window (seconds).
+# Counted by each worker process on its own, so with N workers a contact
+# can send up to N times this many.
+RATE_LIMIT = 5
+RATE_WINDOW = 600
+
+STATUSES = ["Received", "In Progress", "Resolved"]
+PRIORITIES = ["Low", "Medium", "High", "Emergency"]
+ISSUE_TYPES = ["Pothole", "Garbage Accumulation", "Broken Streetlight",
+               "Clogged Drainage", "Graffiti", "Damaged Road", "Water Leak",
+               "Noise Complaint", "Safety Hazard", "Other"]
+
+DATE_FORMAT = "%Y-%m-%d %H:%M"
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+class Categories:
+    """Small-int codes for the values of a categorical field"""
+
+    def __init__(self, values):
+        self.values = list(values)
+        self.codes = {v: i for i, v in enumerate(self.values)}
+        self._lock = threading.Lock()
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            with self._lock:
+                code = self.codes.get(value)
+                if code is None:
+                    # Values outside the known list (e.g. from older data) get the next code
+                    code = len(self.values)
+                    self.values.append(value)
+                    self.codes[value] = code
+        return code
+
+
+STATUS_CODES = Categories(STATUSES)
+PRIORITY_CODES = Categories(PRIORITIES)
+ISSUE_TYPE_CODES = Categories(ISSUE_TYPES)
+
+
+def to_epoch(date_reported):
+    """'YYYY-MM-DD HH:MM' -> seconds since 1970-01-01 in the same (local) clock"""
+    return int((datetime.datetime.strptime(date_reported, DATE_FORMAT) - _EPOCH).total_seconds())
+
+
+def from_epoch(seconds):
+    return _EPOCH + datetime.timedelta(seconds=seconds)
+
+
+class ReportRecord(Mapping):
+    """One report held compactly in memory.
+
+    Status, priority and issue type are small-int codes, the report date is
+    an integer, and description, comments and photo are read from the
+    store's details and comments files only when asked for. Reading it like a dict
+    (``report['status']``, ``report.get('photo')``) works as before.
+    """
+
+    __slots__ = ('id', 'name', 'contact', 'location', 'assigned_to', 'reported_at',
+                 '_issue_type', '_status', '_priority', '_store')
+
+    _ROW_FIELDS = ('id', 'name', 'contact', 'issue_type', 'location',
+                   'status', 'assigned_to', 'date_reported', 'priority')
+
+    def __init__(self, row, store):
+        self.id = row['id']
+        self.name = row['name']
+        self.contact = row['contact']
+        self.location = row['location']
+        self.assigned_to = sys.intern(row['assigned_to'])
+        self.reported_at = to_epoch(row['date_reported'])
+        self._issue_type = ISSUE_TYPE_CODES.code(row['issue_type'])
+        self._status = STATUS_CODES.code(row['status'])
+        self._priority = PRIORITY_CODES.code(row.get('priority', 'Medium'))
+        self._store = store
+
+    @property
+    def issue_type(self):
+        return ISSUE_TYPE_CODES.values[self._issue_type]
+
+    @property
+    def status(self):
+        return STATUS_CODES.values[self._status]
+
+    @property
+    def priority(self):
+        return PRIORITY_CODES.values[self._priority]
+
+    @property
+    def date_reported(self):
+        return from_epoch(self.reported_at).strftime(DATE_FORMAT)
+
+    def to_row(self):
+        """The report without its details, as stored on disk"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'contact': self.contact,
+            'issue_type': self.issue_type,
+            'location': self.location,
+            'status': self.status,
+            'assigned_to': self.assigned_to,
+            'date_reported': self.date_reported,
+            'priority': self.priority
+        }
+
+    # Dict-compatible view
+
+    def __getitem__(self, key):
+        if key == 'comments':
+            return self._store.comments(self.id)
+        if key in DETAIL_FIELDS:
+            return self._store.details(self.id)[key]
+        if key in ReportRecord._ROW_FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        yield from ReportRecord._ROW_FIELDS
+        yield from DETAIL_FIELDS
+
+    def __len__(self):
+        return len(ReportRecord._ROW_FIELDS) + len(DETAIL_FIELDS)
+
+    def __repr__(self):
+        return f"ReportRecord({self.to_row()!r})"
+
+
+class ReportIndex:
+    """ID, status, issue type, priority and date of every report as array columns.
+
+    Row i describes ReportStore.reports[i]. This is all the dashboards need
+    for their counts and charts.
+    """
+
+    CODED = {'status': STATUS_CODES, 'issue_type': ISSUE_TYPE_CODES, 'priority': PRIORITY_CODES}
+
+    def __init__(self):
+        self.id = array('q')
+        self.status = array('H')
+        self.issue_type = array('H')
+        self.priority = array('H')
+        self.reported_at = array('q')
+
+    def __len__(self):
+        return len(self.id)
+
+    def set(self, position, report):
+        values = (report.id, report._status, report._issue_type, report._priority, report.reported_at)
+        columns = (self.id, self.status, self.issue_type, self.priority, self.reported_at)
+        if position == len(self.id):
+            for column, value in zip(columns, values):
+                column.append(value)
+        else:
+            for column, value in zip(columns, values):
+                column[position] = value
+
+    def counts(self, field):
+        """{value: number of reports} for status, issue_type or priority"""
+        values = self.CODED[field].values
+        return Counter({values[code]: n for code, n in Counter(getattr(self, field)).items()})
+
+    def counts_by(self, first, second):
+        """{(first value, second value): number of reports}, e.g. by issue_type and status"""
+        first_values, second_values = self.CODED[first].values, self.CODED[second].values
+        pairs = Counter(zip(getattr(self, first), getattr(self, second)))
+        return Counter({(first_values[a], second_values[b]): n for (a, b), n in pairs.items()})
+
+    def column(self, field):
+        """A coded column as a list of its values"""
+        values = self.CODED[field].values
+        return [values[code] for code in getattr(self, field)]
+
+    def code(self, field, value):
+        return self.CODED[field].code(value)
+
+
+class WordIndex:
+    """Report IDs by each word of their name, location and issue type.
+
+    Kept current as reports are stored, so search() looks up the few
+    reports that match instead of reading every one.
+    """
+
+    def __init__(self):
+        self.ids = {}  # word -> set of report IDs
+        self.vocabulary = []  # every word, sorted, for prefix lookups
+
+    @staticmethod
+    def words(report):
+        return set(WORD.findall(f"{report.name} {report.location} {report.issue_type}".lower()))
+
+    def set(self, report, previous=None):
+        """Index a report, replacing what was indexed for its previous version"""
+        words = self.words(report)
+        old = self.words(previous) if previous is not None else set()
+        for word in old - words:
+            ids = self.ids[word]
+            ids.discard(report.id)
+            if not ids:
+                del self.ids[word]
+                del self.vocabulary[bisect_left(self.vocabulary, word)]
+        for word in words - old:
+            ids = self.ids.get(word)
+            if ids is None:
+                ids = self.ids[word] = set()
+                insort(self.vocabulary, word)
+            ids.add(report.id)
+
+    def find(self, text):
+        """IDs of reports with a word starting with each word of text, or None if text has no words"""
+        found = None
+        for prefix in set(WORD.findall(text.lower())):
+            ids = set()
+            for i in range(bisect_left(self.vocabulary, prefix), len(self.vocabulary)):
+                word = self.vocabulary[i]
+                if not word.startswith(prefix):
+                    break
+                ids |= self.ids[word]
+            found = ids if found is None else found & ids
+            if not found:
+                break
+        return found
+
+
+class ReportAggregates:
+    """The counts behind the dashboards, kept current by applying changes.
+
+    Built once from a ReportIndex, then updated one change at a time from
+    ReportStore.changes_since(), so refreshing costs as much as the number
+    of changes rather than the number of reports.
+    """
+
+    def __init__(self, index, seq):
+        self.seq = seq
+        self.status = index.counts('status')
+        self.by_issue = index.counts_by('issue_type', 'status')
+        self.daily = Counter(from_epoch(t).date() for t in index.reported_at)
+        resolved = index.code('status', 'Resolved')
+        self.resolved_at = Counter(t for t, s in zip(index.reported_at, index.status) if s == resolved)
+
+    @property
+    def total(self):
+        return sum(self.status.values())
+
+    def issue_counts(self):
+        """{issue type: number of reports}"""
+        counts = Counter()
+        for (issue_type, _), n in self.by_issue.items():
+            counts[issue_type] += n
+        return counts
+
+    def apply(self, change):
+        if change['op'] == 'put':
+            if change['previous'] is not None:
+                self._count(change['previous'], -1)
+            self._count(change['report'], 1)
+        self.seq = change['seq']
+
+    def _count(self, row, n):
+        reported_at = to_epoch(row['date_reported'])
+        keys = [(self.status, row['status']),
+                (self.by_issue, (row['issue_type'], row['status'])),
+                (self.daily, from_epoch(reported_at).date())]
+        if row['status'] == 'Resolved':
+            keys.append((self.resolved_at, reported_at))
+        for counter, key in keys:
+            counter[key] += n
+            if counter[key] == 0:
+                del counter[key]
+
+
+class AnalyticsCube:
+    """Number of reports per (year-month, issue type, priority, status).
+
+    A few hundred cells per year of history, so grouping it for a chart or
+    an export costs the same however many reports there are. The store keeps
+    it current on every write and saves it next to each snapshot; it can
+    always be rebuilt from a ReportIndex.
+    """
+
+    DIMENSIONS = ('month', 'issue_type', 'priority', 'status')
+
+    def __init__(self, counts=None):
+        self.counts = Counter(counts or {})
+
+    @classmethod
+    def build(cls, index):
+        """Count every report in the index"""
+        months = {}
+        issue_types, priorities, statuses = (index.CODED[f].values for f in ('issue_type', 'priority', 'status'))
+        cells = Counter()
+        for reported_at, issue_type, priority, status in zip(index.reported_at, index.issue_type,
+                                                             index.priority, index.status):
+            day = reported_at // 86400
+            month = months.get(day)
+            if month is None:
+                month = months[day] = from_epoch(reported_at).strftime('%Y-%m')
+            cells[month, issue_type, priority, status] += 1
+        return cls({(month, issue_types[i], priorities[p], statuses[s]): n
+                    for (month, i, p, s), n in cells.items()})
+
+    def add(self, report, n=1):
+        """Count a ReportRecord in (n=1) or out (n=-1)"""
+        key = (from_epoch(report.reported_at).strftime('%Y-%m'), report.issue_type, report.priority, report.status)
+        self.counts[key] += n
+        if self.counts[key] <= 0:
+            del self.counts[key]
+
+    def totals(self, *dimensions, **filters):
+        """Counts grouped by the given dimensions over the cells matching filters
+
+        e.g. totals('month', issue_type='Pothole') -> {'2025-10': 12, ...};
+        with several dimensions the keys are tuples.
+        """
+        positions = [self.DIMENSIONS.index(d) for d in dimensions]
+        wanted = [(self.DIMENSIONS.index(d), v) for d, v in filters.items()]
+        result = Counter()
+        for key, n in self.counts.items():
+            if all(key[i] == v for i, v in wanted):
+                group = tuple(key[i] for i in positions)
+                result[group[0] if len(group) == 1 else group] += n
+        return result
+
+    def rows(self):
+        """Every cell as a dict, oldest month first, for exports"""
+        return [dict(zip(self.DIMENSIONS + ('reports',), key + (n,))) for key, n in sorted(self.counts.items())]
+
+    def to_dict(self, seq):
+        """Contents of the cube file"""
+        return {'seq': seq, 'cells': [list(key) + [n] for key, n in self.counts.items()]}
+
+    @classmethod
+    def read(cls, path):
+        """Load a cube file; returns (cube, seq)"""
+        data = fmt.read_file(path)
+        return cls({tuple(cell[:-1]): cell[-1] for cell in data['cells']}), data['seq']
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock shared by every worker using the same data directory"""
+    with open(path, 'a+b') as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        else:
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class ReportStore:
+    """Reports shared between sessions and between worker processes.
+
+    The data file holds a snapshot of every report together with the change
+    sequence number it was taken at, next to a file with the AnalyticsCube.
+    Every mutation is appended to a journal as one JSON line carrying the
+    next sequence number, so a worker only has to stat the journal to learn
+    that another worker wrote, and only has to read the new lines to catch up.
+
+    Description and photo of each report live in their own file under
+    ``report_details/`` and are loaded on demand. Comments are appended, one
+    JSON line each, to the report's file under ``report_comments/`` and are
+    read a page at a time.
+    """
+
+    def __init__(self, data_dir=None):
+        self.data_dir = Path(data_dir or os.environ.get('COMMUNITYFIX_DATA_DIR', '.'))
+        self.data_file = self.data_dir / 'reports_data.cfx'
+        self.cube_file = self.data_dir / 'reports_cube.cfx'
+        self.legacy_file = self.data_dir / 'reports_data.json'
+        self.journal_file = self.data_dir / 'reports_journal.jsonl'
+        self.lock_file = self.data_dir / 'reports_data.lock'
+        self.details_dir = self.data_dir / 'report_details'
+        self.comments_dir = self.data_dir / 'report_comments'
+
+        self.reports = []
+        self.index = ReportIndex()
+        self.words = WordIndex()
+        self.cube = AnalyticsCube()
+        self.seq = 0
+        self._by_id = {}
+        self._positions = {}
+        self._max_id = 0
+        self._details_cache = OrderedDict()
+        self._comments_cache = OrderedDict()
+        self._tokens = OrderedDict()
+        self._feed = deque(maxlen=FEED_SIZE)
+        self._journal_stat = None
+        self._journal_header = None
+        self._journal_offset = 0
+        self._pending = 0
+        self._migrated = False
+        self._lock = threading.RLock()
+
+        self.details_dir.mkdir(parents=True, exist_ok=True)
+        self.comments_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock, file_lock(self.lock_file):
+            self._load_snapshot()
+            if not self.journal_file.exists():
+                self._write_journal_header()
+            self._read_journal()
+            if self._migrated:
+                # Rewrite in the current format so the upgrade is not repeated
+                self._write_snapshot()
+                if self.legacy_file.exists():
+                    os.replace(self.legacy_file, self.legacy_file.with_suffix('.v1.json'))
+
+    # Reading
+
+    def get(self, report_id):
+        """Return the report with the given ID, or None"""
+        return self._by_id.get(report_id)
+
+    def search(self, text, limit=SEARCH_LIMIT):
+        """Newest reports whose ID is text or that have a word starting with each word of text
+
+        Words are those of the name, location and issue type. With no text,
+        the newest reports. Matches come from the word index, so a search
+        costs as much as the reports it finds.
+        """
+        text = text.strip()
+        with self._lock:
+            found = []
+            if text.lstrip('#').isdigit():
+                report = self.get(int(text.lstrip('#')))
+                if report is not None:
+                    found.append(report)
+            ids = self.words.find(text)
+            if ids is None:
+                ids = {r.id for r in self.reports[-limit:]}
+            ids.difference_update(r.id for r in found)
+            for report_id in heapq.nlargest(limit - len(found), ids, key=self._positions.__getitem__):
+                found.append(self._by_id[report_id])
+            return found
+
+    def select(self, predicate):
+        """IDs of the reports passing predicate, in order, and the sequence number they are current at"""
+        with self._lock:
+            return [r.id for r in self.reports if predicate(r)], self.seq
+
+    def details(self, report_id):
+        """Description and photo of a report"""
+        with self._lock:
+            details = self._details_cache.get(report_id)
+            if details is not None:
+                self._details_cache.move_to_end(report_id)
+                return details
+            details = self._read_details(report_id)
+            self._details_cache[report_id] = details
+            if len(self._details_cache) > DETAILS_CACHE_SIZE:
+                self._details_cache.popitem(last=False)
+            return details
+
+    def comment_count(self, report_id):
+        return len(self._comment_lines(report_id))
+
+    def comments(self, report_id, start=0, stop=None):
+        """Comments of a report, oldest first; comments[start:stop] when given a range
+
+        Only the comments in the range are decoded.
+        """
+        return [loads_json(line) for line in self._comment_lines(report_id)[start:stop]]
+
+    def export_rows(self):
+        """Every report with its description, comments and photo, for a full export
+
+        The details and comments files are read once each, straight from
+        disk, so exporting does not churn the details cache.
+        """
+        with self._lock:
+            reports = list(self.reports)
+        with os.scandir(self.comments_dir) as entries:
+            threads = {entry.name for entry in entries}
+        rows = []
+        for report in reports:
+            row = report.to_row()
+            details = self._read_details(report.id)
+            if self._comments_path(report.id).name in threads:
+                comments = [loads_json(line) for line in self._read_comment_lines(report.id)]
+            else:
+                comments = details.get('comments', [])
+            row['description'] = details.get('description', '')
+            row['comments'] = comments
+            row['photo'] = details.get('photo')
+            rows.append(row)
+        return rows
+
+    def changes_since(self, seq):
+        """Changes after sequence number seq, oldest first.
+
+        Each change is {'seq', 'op', 'id'}; 'put' changes (new reports and
+        admin updates) also carry the report's fields as 'report' and as
+        they were before as 'previous' (None for a new report), 'comment'
+        changes carry nothing more. Returns None when changes
+        that far back are no longer kept; start over from the full data then.
+        """
+        with self._lock:
+            if seq == self.seq:
+                return []
+            if seq > self.seq or not self._feed or self._feed[0]['seq'] > seq + 1:
+                return None
+            return [change for change in self._feed if change['seq'] > seq]
+
+    def aggregates(self):
+        """Dashboard counts as of now, to be kept current with changes_since()"""
+        with self._lock:
+            return ReportAggregates(self.index, self.seq)
+
+    def analytics(self):
+        """A copy of the analytics cube as of now"""
+        with self._lock:
+            return AnalyticsCube(self.cube.counts)
+
+    def rebuild_analytics(self):
+        """Recount the analytics cube from the reports and save it with a fresh snapshot"""
+        with self._lock, file_lock(self.lock_file):
+            self._read_journal()
+            self.cube = AnalyticsCube.build(self.index)
+            self._write_snapshot()
+
+    def refresh(self):
+        """Apply changes made by other workers; returns True if anything changed"""
+        if self._journal_stat == self._stat_journal():
+            return False
+        with self._lock, file_lock(self.lock_file):
+            return self._read_journal()
+
+    # Writing
+
+    def add_report(self, report, token=None):
+        """Store a new report, assigning the next free ID; returns the ID
+
+        A report submitted again with the same token is not stored twice;
+        the ID of the first one is returned instead.
+        """
+        def build():
+            if token is not None and token in self._tokens:
+                return None
+            row = dict(report)
+            row['id'] = self._max_id + 1
+            self._write_details(row['id'], {k: row.pop(k, None) for k in DETAIL_FIELDS})
+            entry = {'op': 'put', 'report': row}
+            if token is not None:
+                entry['token'] = token
+            return entry
+        entry = self._commit(build)
+        return entry['report']['id'] if entry else self._tokens[token]
+
+    def update_report(self, report_id, **changes):
+        """Change top-level fields (status, assigned_to, priority, ...) of a report"""
+        def build():
+            row = self._require(report_id).to_row()
+            row.update(changes)
+            return {'op': 'put', 'report': row}
+        self._commit(build)
+
+    def add_comment(self, report_id, text, author="Admin"):
+        """Append a comment to a report"""
+        def build():
+            self._require(report_id)
+            self._move_legacy_comments(report_id)
+            comment = {
+                'author': author,
+                'text': text,
+                'timestamp': datetime.datetime.now().strftime(DATE_FORMAT)
+            }
+            with open(self._comments_path(report_id), 'ab') as f:
+                f.write(dumps_json(comment) + b'\n')
+            self._comments_cache.pop(report_id, None)
+            return {'op': 'comment', 'id': report_id}
+        self._commit(build)
+
+    def snapshot(self):
+        """Write every report to the data file and start a fresh journal"""
+        with self._lock, file_lock(self.lock_file):
+            self._read_journal()
+            self._write_snapshot()
+
+    # Internals
+
+    def _require(self, report_id):
+        report = self._by_id.get(report_id)
+        if report is None:
+            raise KeyError(f"Report #{report_id} does not exist")
+        return report
+
+    def _details_path(self, report_id):
+        return self.details_dir / f"{report_id}.json"
+
+    def _comments_path(self, report_id):
+        return self.comments_dir / f"{report_id}.jsonl"
+
+    def _write_details(self, report_id, details):
+        """Replace a report's details file, and its comments if given; caller holds the file lock"""
+        details = dict(details)
+        comments = details.pop('comments', None)
+        path = self._details_path(report_id)
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(dumps_json(details))
+        os.replace(tmp, path)
+        self._details_cache.pop(report_id, None)
+        if comments:
+            self._write_file(self._comments_path(report_id), b''.join(dumps_json(c) + b'\n' for c in comments))
+            self._comments_cache.pop(report_id, None)
+
+    def _read_details(self, report_id):
+        try:
+            with open(self._details_path(report_id), 'rb') as f:
+                return loads_json(f.read())
+        except FileNotFoundError:
+            return {'description': '', 'photo': None}
+
+    def _read_comment_lines(self, report_id):
+        with open(self._comments_path(report_id), 'rb') as f:
+            return [line for line in f if line.endswith(b'\n')]
+
+    def _comment_lines(self, report_id):
+        """A report's comments as undecoded JSON lines, oldest first"""
+        with self._lock:
+            lines = self._comments_cache.get(report_id)
+            if lines is not None:
+                self._comments_cache.move_to_end(report_id)
+                return lines
+            try:
+                lines = self._read_comment_lines(report_id)
+            except FileNotFoundError:
+                # Details files written before comments had their own files
+                lines = [dumps_json(c) for c in self.details(report_id).get('comments', [])]
+            self._comments_cache[report_id] = lines
+            if len(self._comments_cache) > DETAILS_CACHE_SIZE:
+                self._comments_cache.popitem(last=False)
+            return lines
+
+    def _move_legacy_comments(self, report_id):
+        """Move comments still inside a report's details file to its comments file"""
+        details = self.details(report_id)
+        if 'comments' in details and not self._comments_path(report_id).exists():
+            self._write_details(report_id, details)
+
+    def _commit(self, build):
+        """Catch up, then append one mutation built against the latest state"""
+        with self._lock, file_lock(self.lock_file):
+            self._read_journal()
+            entry = build()
+            if entry is None:
+                return None
+            entry['seq'] = self.seq + 1
+            if self._journal_stat is None:
+                self._write_journal_header()
+            with open(self.journal_file, 'r+b') as f:
+                # Cut off any half-written line left by a writer that crashed,
+                # so the new entry starts on a line of its own
+                f.seek(self._journal_offset)
+                f.truncate()
+                f.write(dumps_json(entry) + b'\n')
+                self._journal_offset = f.tell()
+            self._journal_stat = self._stat_journal()
+            self._apply(entry)
+            self._pending += 1
+            if self._pending >= COMPACT_EVERY:
+                self._write_snapshot()
+            return entry
+
+    def _apply(self, entry):
+        if entry['op'] == 'put':
+            previous = self._by_id.get(entry['report']['id'])
+            report = self._put(entry['report'])
+            if previous is not None:
+                self.cube.add(previous, -1)
+            self.cube.add(report)
+            if 'token' in entry:
+                self._remember_token(entry['token'], report.id)
+            change = {'seq': entry['seq'], 'op': 'put', 'id': report.id, 'report': report.to_row(),
+                      'previous': previous.to_row() if previous is not None else None}
+        else:
+            self._details_cache.pop(entry['id'], None)
+            self._comments_cache.pop(entry['id'], None)
+            change = {'seq': entry['seq'], 'op': entry['op'], 'id': entry['id']}
+        self._feed.append(change)
+        self.seq = entry['seq']
+
+    def _put(self, row):
+        report = self._record(row)
+        self._place(report, self.reports, self.index, self.words, self._positions)
+        self._by_id[report.id] = report
+        self._max_id = max(self._max_id, report.id)
+        return report
+
+    def _record(self, row):
+        if any(k in row for k in DETAIL_FIELDS):
+            # Written before details had their own files; move them out
+            self._migrated = True
+            self._write_details(row['id'], {
+                'description': row.get('description', ''),
+                'comments': row.get('comments', []),
+                'photo': row.get('photo')
+            })
+        return ReportRecord(row, self)
+
+    @staticmethod
+    def _place(report, reports, index, words, positions):
+        """Add a report to, or replace it in, the report list and indexes"""
+        position = positions.get(report.id)
+        if position is None:
+            position = positions[report.id] = len(reports)
+            index.set(position, report)
+            words.set(report)
+            reports.append(report)
+        else:
+            index.set(position, report)
+            words.set(report, reports[position])
+            reports[position] = report
+
+    def _remember_token(self, token, report_id):
+        self._tokens[token] = report_id
+        if len(self._tokens) > TOKEN_MEMORY:
+            self._tokens.popitem(last=False)
+
+    def _stat_journal(self):
+        try:
+            st = os.stat(self.journal_file)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _load_snapshot(self):
+        data = {}
+        if self.data_file.exists():
+            data = fmt.read_file(self.data_file)
+        elif self.legacy_file.exists():
+            data = fmt.read_file(self.legacy_file)
+            self._migrated = True
+        for report_id, details in data.get('details', {}).items():
+            self._write_details(report_id, details)
+        # Built aside and swapped in at once: sessions read reports and get()
+        # without the lock and must never see a half-loaded store
+        reports, index, words, positions = [], ReportIndex(), WordIndex(), {}
+        for row in data.get('reports', []):
+            self._place(self._record(row), reports, index, words, positions)
+        seq = data.get('seq', 0)
+        cube = self._load_cube(index, seq)
+        self._by_id = {report.id: report for report in reports}
+        self.reports, self.index, self.words, self._positions, self.cube = reports, index, words, positions, cube
+        self._max_id = max(self._by_id, default=0)
+        self._tokens = OrderedDict(data.get('tokens', {}))
+        self.seq = seq
+        self._feed.clear()
+        self._details_cache.clear()
+        self._comments_cache.clear()
+        self._journal_stat = None
+        self._journal_header = None
+        self._journal_offset = 0
+        self._pending = 0
+
+    def _load_cube(self, index, seq):
+        """The saved cube if it was written with the snapshot at seq, else a fresh count of index"""
+        try:
+            cube, cube_seq = AnalyticsCube.read(self.cube_file)
+        except Exception:
+            # Only counts derived from the reports; a missing or unreadable file is recounted
+            return AnalyticsCube.build(index)
+        return cube if cube_seq == seq else AnalyticsCube.build(index)
+
+    def _read_journal(self):
+        """Apply journal lines past our offset; caller holds the file lock"""
+        stat = self._stat_journal()
+        if stat is None:
+            self._journal_stat = None
+            return False
+        changed = False
+        with open(self.journal_file, 'rb') as f:
+            # Every journal starts with a header line of its own, so a changed
+            # header means it was compacted and restarted since we last read
+            # it (an inode number can be reused, so that is not relied on)
+            header = f.readline()
+            if header != self._journal_header:
+                if loads_json(header)['base_seq'] > self.seq:
+                    self._load_snapshot()
+                    changed = True
+                self._journal_header = header
+                self._journal_offset = f.tell()
+                self._pending = 0
+            f.seek(self._journal_offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # a writer crashed mid-line; the next commit cuts it off
+                self._journal_offset += len(line)
+                entry = loads_json(line)
+                if entry['seq'] > self.seq:
+                    self._apply(entry)
+                    self._pending += 1
+                    changed = True
+        self._journal_stat = stat
+        return changed
+
+    def _write_snapshot(self):
+        data = {
+            'reports': [r.to_row() for r in self.reports],
+            'seq': self.seq,
+            'tokens': dict(self._tokens),
+            'last_updated': datetime.datetime.now().isoformat()
+        }
+        self._write_file(self.data_file, fmt.encode(data))
+        self._write_file(self.cube_file, fmt.encode(self.cube.to_dict(self.seq)))
+        self._write_journal_header()
+
+    def _write_file(self, path, content):
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(content)
+        os.replace(tmp, path)
+
+    def _write_journal_header(self):
+        """Start an empty journal whose entries follow the current sequence number"""
+        self._journal_header = dumps_json({'base_seq': self.seq, 'journal': uuid.uuid4().hex}) + b'\n'
+        self._write_file(self.journal_file, self._journal_header)
+        self._journal_stat = self._stat_journal()
+        self._journal_offset = self._journal_stat[1]
+        self._pending = 0
+
+
+class SubmissionQueue:
+    """Accepts citizen reports quickly and writes them on a background thread.
+
+    Validation happens before a report gets here; encoding the photo and
+    writing to the store happen later, one report at a time, so a burst of
+    submissions does not make each submitter wait for the others. Every
+    submission carries a token; submitting the same token again (a double
+    tap) does not queue a second report, unless saving it failed.
+
+    The per-contact rate limit is kept in memory, per process. Waiting
+    photos are held as raw bytes, so the queue is bounded by their total
+    size as well as by count.
+    """
+
+    def __init__(self, store, maxsize=INGEST_QUEUE_SIZE, max_bytes=INGEST_QUEUE_BYTES,
+                 rate_limit=RATE_LIMIT, rate_window=RATE_WINDOW):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self._queue = queue.Queue(maxsize)
+        self._queued_bytes = 0
+        self._results = OrderedDict()
+        self._recent = {}
+        self._changed = threading.Condition()
+        self._worker = threading.Thread(target=self._run, name="report-ingest", daemon=True)
+        self._worker.start()
+
+    def submit(self, token, report, photo=None):
+        """Queue a report with the raw bytes of its photo.
+
+        Returns 'queued', 'duplicate' (this token is queued or was saved),
+        'rate_limited' (too many reports from this contact number lately),
+        'too_large' (the photo is over MAX_PHOTO_BYTES) or 'busy' (the queue
+        is full; try again shortly).
+        """
+        size = len(photo) if photo is not None else 0
+        if size > MAX_PHOTO_BYTES:
+            return 'too_large'
+        with self._changed:
+            previous = self._results.get(token)
+            if previous is not None and previous['status'] != 'failed':
+                return 'duplicate'
+            contact = re.sub(r'\D', '', report['contact'])
+            now = time.monotonic()
+            recent = self._recent.setdefault(contact, deque())
+            while recent and now - recent[0] > self.rate_window:
+                recent.popleft()
+            if len(recent) >= self.rate_limit:
+                return 'rate_limited'
+            if self._queued_bytes + size > self.max_bytes:
+                return 'busy'
+            try:
+                self._queue.put_nowait((token, report, photo))
+            except queue.Full:
+                return 'busy'
+            recent.append(now)
+            self._queued_bytes += size
+            self._results.pop(token, None)
+            self._results[token] = {'status': 'queued'}
+            if len(self._results) > TOKEN_MEMORY:
+                self._results.popitem(last=False)
+            if len(self._recent) > 10 * TOKEN_MEMORY:
+                self._recent = {c: t for c, t in self._recent.items() if t and now - t[-1] <= self.rate_window}
+        return 'queued'
+
+    def result(self, token, timeout=0):
+        """Wait up to timeout seconds for a submission to be written.
+
+        Returns {'status': 'queued'}, {'status': 'saved', 'report_id': ...},
+        {'status': 'failed', 'error': ...}, or None for an unknown token.
+        """
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                result = self._results.get(token)
+                remaining = deadline - time.monotonic()
+                if result is None or result['status'] != 'queued' or remaining <= 0:
+                    return result
+                self._changed.wait(remaining)
+
+    def pending(self):
+        """Number of submissions not yet written"""
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            token, report, photo = self._queue.get()
+            try:
+                if photo is not None:
+                    report['photo'] = base64.b64encode(photo).decode()
+                result = {'status': 'saved', 'report_id': self.store.add_report(report, token=token)}
+            except Exception as e:
+                result = {'status': 'failed', 'error': str(e)}
+            with self._changed:
+                self._results[token] = result
+                self._queued_bytes -= len(photo) if photo is not None else 0
+                self._changed.notify_all()
+            self._queue.task_done()
@@ -0,0 +1,83 @@
+"""Compare the memory held by reports as plain dicts and as ReportRecords.
+
+The saving has two parts, reported separately: leaving description,
+comments and photo out of memory (a dict of just the row fields), and
+holding those row fields compactly (ReportRecord instead of that dict).
+
+    python scripts/bench_memory.py --reports 100000
+"""
+import argparse
+import gc
+import json
+import random
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from communityfix_store import DETAIL_FIELDS, ISSUE_TYPES, PRIORITIES, STATUSES, ReportRecord
+
+
+def sample_reports(count):
+    rng = random.Random(42)
+    for n in range(1, count + 1):
+        yield {
+            'id': n,
+            'name': f"Resident {rng.randrange(5000)}",
+            'contact': f"0917{rng.randrange(10**7):07d}",
+            'issue_type': rng.choice(ISSUE_TYPES),
+            'location': f"Purok {rng.randrange(12)}, Street {rng.randrange(80)}",
+            'description': "Reported near the corner; " * rng.randrange(2, 8),
+            'status': rng.choice(STATUSES),
+            'assigned_to': rng.choice(['Not assigned', 'Maintenance Team', 'Tanod']),
+            'date_reported': f"20{rng.randrange(24, 27)}-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d} "
+                             f"{rng.randrange(24):02d}:{rng.randrange(60):02d}",
+            'comments': [{'author': 'Admin', 'text': "Team dispatched", 'timestamp': "2025-10-01 09:30"}],
+            'photo': None,
+            'priority': rng.choice(PRIORITIES)
+        }
+
+
+def measure(build, lines):
+    gc.collect()
+    tracemalloc.start()
+    held = build(lines)
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return held, current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--reports', type=int, default=100_000)
+    args = parser.parse_args()
+
+    # Decode every report from its own JSON text, as loading the data file does
+    reports = list(sample_reports(args.reports))
+    lines = [json.dumps(r) for r in reports]
+    row_lines = [json.dumps({k: v for k, v in r.items() if k not in DETAIL_FIELDS}) for r in reports]
+    del reports
+
+    dicts, dict_bytes = measure(lambda ls: [json.loads(line) for line in ls], lines)
+    del dicts
+    rows, row_bytes = measure(lambda ls: [json.loads(line) for line in ls], row_lines)
+    del rows
+    records, record_bytes = measure(lambda ls: [ReportRecord(json.loads(line), None) for line in ls], row_lines)
+    del records
+
+    def line(label, held):
+        print(f"{label:27} {held / 2**20:8.1f} MiB  {held / args.reports:6.0f} B/report")
+
+    print(f"reports: {args.reports}")
+    line("dict with details", dict_bytes)
+    line("dict of row fields only", row_bytes)
+    line("ReportRecord", record_bytes)
+    print(f"saving from details on disk {(1 - row_bytes / dict_bytes) * 100:8.1f} %")
+    print(f"saving from compact rows    {(1 - record_bytes / row_bytes) * 100:8.1f} %  (like for like)")
+    print(f"saving overall              {(1 - record_bytes / dict_bytes) * 100:8.1f} %")
+
+
+if __name__ == '__main__':
+    main()
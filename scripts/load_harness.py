@@ -0,0 +1,554 @@
+"""Drive concurrent simulated sessions against a running app for capacity planning.
+
+Starts communityfix_app.py with ``streamlit run`` on a free port and a fresh
+data directory, and connects every simulated session to it over its own
+websocket the way a browser tab does. The sessions' script runs therefore
+overlap inside one worker exactly as real users' would. Each session
+repeatedly picks one workload:
+
+    submit        citizen fills in and submits the report form, then waits
+                  for the Report ID the way the page's status check does
+    submit_photo  the same with a photo sent through the file uploader
+    browse        Progress Dashboard, opening a report's details
+    admin         Admin Dashboard search, status filter, finding a report,
+                  status update, comment
+    export        Admin Dashboard CSV export
+
+Per workload the JSON output gives throughput and the latency of each
+interaction (from sending a click or input until the server has finished
+the script run it caused) and the server CPU time per interaction, plus
+the time from submitting a report until its ID is shown, the server's
+CPU use and resident memory (RSS) over the run, and
+integrity checks: every submitted report is stored exactly once, with its
+photo where one was sent, and every added comment is present.
+
+Needs the websockets package (pip install websockets). The sessions'
+client side runs in this process on the same machine as the server, so
+leave it a core.
+
+    python scripts/load_harness.py --citizens 8 --admins 2 --duration 60 > capacity.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+from pathlib import Path
+
+try:
+    import websockets
+except ImportError:
+    sys.exit("load_harness.py needs the websockets package: pip install websockets")
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from streamlit.testing.v1.element_tree import parse_tree_from_messages
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from communityfix_store import ReportStore
+
+APP = str(ROOT / 'communityfix_app.py')
+
+ADMIN_PASSWORD = "admin123"
+
+CITIZEN_MIX = {'submit': 4, 'submit_photo': 1, 'browse': 5}
+ADMIN_MIX = {'admin': 4, 'export': 1, 'browse': 1}
+
+# Longest a citizen waits for the Report ID before moving on (seconds)
+REPORT_ID_TIMEOUT = 30
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def process_rss(pid):
+    """Resident set size of a process in bytes, or None where /proc is not available"""
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return None
+
+
+def process_cpu(pid):
+    """User plus system CPU seconds used by a process so far, or None where /proc is not available"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+class CpuMeter:
+    """Shares out the server's CPU time among the interactions in flight.
+
+    Sessions overlap, so each stretch of CPU time between two interactions
+    starting or finishing is split evenly over those running in it.
+    """
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.last = process_cpu(pid)
+        self.in_flight = {}
+
+    def _advance(self):
+        now = process_cpu(self.pid)
+        if self.in_flight:
+            share = (now - self.last) / len(self.in_flight)
+            for key in self.in_flight:
+                self.in_flight[key] += share
+        self.last = now
+
+    def start(self):
+        if self.last is None:
+            return None
+        self._advance()
+        key = object()
+        self.in_flight[key] = 0.0
+        return key
+
+    def stop(self, key):
+        if key is None:
+            return None
+        self._advance()
+        return self.in_flight.pop(key)
+
+
+def sample_photo():
+    """A phone-sized JPEG of noise, roughly the size of a real photo"""
+    from PIL import Image
+    image = Image.frombytes('RGB', (640, 480), os.urandom(640 * 480 * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=70)
+    return buffer.getvalue()
+
+
+def put_file(url, name, data, mime):
+    """Upload one file the way the browser's file uploader does"""
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{name}"\r\n'
+            f'Content-Type: {mime}\r\n\r\n').encode() + data + f'\r\n--{boundary}--\r\n'.encode()
+    request = urllib.request.Request(url, data=body, method='PUT',
+                                     headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+    with urllib.request.urlopen(request) as response:
+        response.read()
+
+
+def start_server(data_dir, port):
+    log = open(Path(data_dir) / 'server.log', 'wb')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', APP,
+         '--server.port', str(port), '--server.address', '127.0.0.1', '--server.headless', 'true',
+         '--server.fileWatcherType', 'none', '--browser.gatherUsageStats', 'false',
+         '--server.enableXsrfProtection', 'false', '--server.enableCORS', 'false'],
+        cwd=data_dir, env=dict(os.environ, COMMUNITYFIX_DATA_DIR=data_dir), stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            break
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1).read()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    sys.exit("The app did not start:\n" + (Path(data_dir) / 'server.log').read_text(errors='replace')[-2000:])
+
+
+class ScriptError(Exception):
+    pass
+
+
+class Session:
+    """One simulated browser tab and what it expects to find stored"""
+
+    def __init__(self, name, admin, port, photo, rng, meter):
+        self.name = name
+        self.admin = admin
+        self.base_url = f'http://127.0.0.1:{port}'
+        self.photo = photo
+        self.rng = rng
+        self.meter = meter
+        self.ws = None
+        self.session_id = None
+        self.deltas = {}  # delta path -> ForwardMsg, what is on the page now
+        self.fragments = {}  # widget id -> id of the fragment it is in
+        self.auto_reruns = {}  # fragment id -> seconds between reruns
+        self.cache = {}  # message hash -> ForwardMsg
+        self.tree = None
+        self.latencies = []  # seconds per interaction of the current workload
+        self.cpu = []  # server CPU seconds per interaction of the current workload
+        self.submitted = []
+        self.photos = []
+        self.comments = []
+        self.id_waits = []
+
+    async def connect(self):
+        if self.ws is not None:
+            await self.ws.close()
+        self.ws = await websockets.connect(self.base_url.replace('http', 'ws') + '/_stcore/stream',
+                                           subprotocols=['streamlit'], max_size=None)
+        self.deltas, self.fragments, self.auto_reruns = {}, {}, {}
+        await self.rerun()
+        if self.admin:
+            await self.goto("Admin Login")
+            await self.interact(self.widget('text_input', "Password").input(ADMIN_PASSWORD),
+                                self.widget('button', "Login").click())
+
+    # Talking to the server
+
+    async def next_message(self):
+        msg = ForwardMsg()
+        msg.ParseFromString(await self.ws.recv())
+        if msg.WhichOneof('type') == 'ref_hash':
+            cached = ForwardMsg()
+            cached.CopyFrom(self.cache[msg.ref_hash])
+            cached.metadata.CopyFrom(msg.metadata)
+            msg = cached
+        elif msg.hash:
+            self.cache[msg.hash] = msg
+        return msg
+
+    async def rerun(self, widgets=(), fragment_id='', auto=False):
+        """Ask for a script run and wait until the page is complete again"""
+        back = BackMsg()
+        back.rerun_script.query_string = ''
+        back.rerun_script.widget_states.widgets.extend(widgets)
+        if fragment_id:
+            back.rerun_script.fragment_id = fragment_id
+        back.rerun_script.is_auto_rerun = auto
+        began = time.monotonic()
+        cpu = self.meter.start()
+        await self.ws.send(back.SerializeToString())
+        running, sent = set(), set()
+        while True:
+            msg = await self.next_message()
+            kind = msg.WhichOneof('type')
+            if kind == 'new_session':
+                self.session_id = msg.new_session.initialize.session_id
+                running = set(msg.new_session.fragment_ids_this_run)
+                sent = set()
+                if not running:
+                    self.auto_reruns = {}
+            elif kind == 'delta':
+                path = tuple(msg.metadata.delta_path)
+                self.deltas[path] = msg
+                sent.add(path)
+                element = msg.delta.new_element
+                if msg.delta.WhichOneof('type') == 'new_element' and element.WhichOneof('type'):
+                    widget_id = getattr(getattr(element, element.WhichOneof('type')), 'id', '')
+                    if widget_id:
+                        self.fragments[widget_id] = msg.delta.fragment_id
+            elif kind == 'auto_rerun':
+                self.auto_reruns[msg.auto_rerun.fragment_id] = msg.auto_rerun.interval
+            elif kind == 'script_finished' and msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                break
+        # Drop what the run did not draw again, as the browser does
+        self.deltas = {path: msg for path, msg in self.deltas.items()
+                       if path in sent or (running and msg.delta.fragment_id not in running)}
+        self.latencies.append(time.monotonic() - began)
+        cpu = self.meter.stop(cpu)
+        if cpu is not None:
+            self.cpu.append(cpu)
+        self.tree = parse_tree_from_messages(list(self.deltas.values()))
+        if self.tree.exception:
+            raise ScriptError(self.tree.exception[0].message)
+
+    async def interact(self, *changes):
+        """Send changed widgets (element nodes or ready WidgetStates) as one browser event"""
+        states = [c if isinstance(c, WidgetState) else c._widget_state for c in changes]
+        fragments = {self.fragments.get(state.id, '') for state in states}
+        await self.rerun(states, fragments.pop() if len(fragments) == 1 else '')
+
+    async def upload(self, label, name, data, mime):
+        """Upload a file for a file uploader; returns its WidgetState"""
+        uploader = self.widget('file_uploader', label)
+        back = BackMsg()
+        back.file_urls_request.request_id = uuid.uuid4().hex
+        back.file_urls_request.file_names.append(name)
+        back.file_urls_request.session_id = self.session_id
+        await self.ws.send(back.SerializeToString())
+        while True:
+            msg = await self.next_message()
+            if (msg.WhichOneof('type') == 'file_urls_response'
+                    and msg.file_urls_response.response_id == back.file_urls_request.request_id):
+                break
+        urls = msg.file_urls_response.file_urls[0]
+        url = urls.upload_url if urls.upload_url.startswith('http') else self.base_url + urls.upload_url
+        await asyncio.to_thread(put_file, url, name, data, mime)
+        state = WidgetState(id=uploader.id)
+        info = state.file_uploader_state_value.uploaded_file_info.add()
+        info.file_id = urls.file_id
+        info.name = name
+        info.size = len(data)
+        info.file_urls.CopyFrom(urls)
+        return state
+
+    def widget(self, kind, label):
+        return next(w for w in getattr(self.tree, kind) if w.label == label)
+
+    def choose(self, kind, label, option):
+        """WidgetState for picking an option by its shown label, as the browser sends it"""
+        widget = self.widget(kind, label)
+        if option not in widget.options:
+            raise ScriptError(f"{label!r} has no option {option!r}")
+        return WidgetState(id=widget.id, string_value=option)
+
+    async def goto(self, page):
+        await self.interact(self.choose('radio', "Navigation", page))
+
+    # Workloads
+
+    async def submit(self, with_photo=False):
+        await self.goto("Report Issue")
+        marker = uuid.uuid4().hex[:12]
+        changes = [
+            self.widget('text_input', "Your Name *").input(f"Load {self.name}"),
+            self.widget('text_input', "Contact Number *").input(f"09{self.rng.randrange(10**9):09d}"),
+            self.widget('text_input', "Location *").input(f"Purok {self.rng.randrange(9)}, Main Street"),
+            self.widget('text_area', "Description *").input(f"Simulated report {marker} from the load harness")
+        ]
+        if with_photo:
+            changes.append(await self.upload("Upload Photo (Optional)", "photo.jpg", self.photo, "image/jpeg"))
+        began = time.monotonic()
+        await self.interact(*changes, self.widget('button', "🚀 Submit Report").click())
+        if not self.report_id_shown() and not any("processing" in i.value for i in self.tree.info):
+            return  # turned away (rate limited or busy)
+        self.submitted.append(marker)
+        if with_photo:
+            self.photos.append(marker)
+        # The status fragment reruns itself until the Report ID is there
+        while not self.report_id_shown() and self.auto_reruns and time.monotonic() - began < REPORT_ID_TIMEOUT:
+            fragment_id, interval = next(iter(self.auto_reruns.items()))
+            await asyncio.sleep(interval)
+            await self.rerun(fragment_id=fragment_id, auto=True)
+        if self.report_id_shown():
+            self.id_waits.append(time.monotonic() - began)
+
+    async def submit_photo(self):
+        await self.submit(with_photo=True)
+
+    def report_id_shown(self):
+        return any("Report ID" in m.value for m in self.tree.markdown)
+
+    async def browse(self):
+        await self.goto("Progress Dashboard")
+        details = [b for b in self.tree.button if b.label == "View Details"]
+        if details:
+            await self.interact(self.rng.choice(details).click())
+
+    async def admin_work(self):
+        await self.goto("Admin Dashboard")
+        await self.interact(self.widget('text_input', "🔍 Search reports").input(self.rng.choice(["Purok", "Main", "Pothole", ""])))
+        await self.interact(self.choose('selectbox', "Filter by Status", self.rng.choice(["All", "Received", "In Progress"])))
+        await self.interact(self.widget('text_input', "Find Report").input(self.rng.choice(["Purok", "Load", ""])))
+        picker = next((s for s in self.tree.selectbox if s.label == "Select Report"), None)
+        if picker is None or not picker.options:
+            return
+        await self.interact(self.choose('selectbox', "Select Report", self.rng.choice(picker.options)))
+        await self.interact(self.choose('selectbox', "Update Status", self.rng.choice(["In Progress", "Resolved"])))
+        await self.interact(self.widget('button', "Update Report").click())
+        text = f"Load comment {uuid.uuid4().hex[:12]}"
+        await self.interact(self.widget('text_area', "Add comment/update").input(text))
+        await self.interact(self.widget('button', "Add Comment").click())
+        self.comments.append(text)
+
+    async def export(self):
+        await self.goto("Admin Dashboard")
+        await self.interact(self.widget('button', "📥 Export Reports to CSV").click())
+
+
+WORKLOADS = {
+    'submit': Session.submit,
+    'submit_photo': Session.submit_photo,
+    'browse': Session.browse,
+    'admin': Session.admin_work,
+    'export': Session.export
+}
+
+
+async def run_session(session, mix, until, think, results):
+    actions, weights = zip(*mix.items())
+    while time.monotonic() < until:
+        action = session.rng.choices(actions, weights)[0]
+        session.latencies, session.cpu = [], []
+        error = None
+        try:
+            await WORKLOADS[action](session)
+        except ScriptError as e:
+            error = str(e)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        results.append((action, session.latencies, session.cpu, error))
+        if error:
+            try:
+                await session.connect()  # start over in a fresh tab
+            except Exception as e:
+                results.append(('reconnect', [], [], f"{type(e).__name__}: {e}"))
+        await asyncio.sleep(session.rng.uniform(0, 2 * think))
+
+
+async def drive(sessions, duration, think, server_pid):
+    for session, _ in sessions:
+        await session.connect()
+    rss_start = process_rss(server_pid)
+    rss_samples = []
+    cpu_start = process_cpu(server_pid)
+
+    async def sample_rss():
+        while True:
+            rss = process_rss(server_pid)
+            if rss is not None:
+                rss_samples.append(rss)
+            await asyncio.sleep(0.5)
+
+    sampler = asyncio.create_task(sample_rss())
+    results = []
+    started = time.monotonic()
+    await asyncio.gather(*(run_session(s, mix, started + duration, think, results) for s, mix in sessions))
+    elapsed = time.monotonic() - started
+    cpu = process_cpu(server_pid) - cpu_start if cpu_start is not None else None
+    sampler.cancel()
+    for session, _ in sessions:
+        await session.ws.close()
+    return results, elapsed, cpu, rss_start, rss_samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--citizens', type=int, default=8)
+    parser.add_argument('--admins', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=30, help="seconds")
+    parser.add_argument('--think', type=float, default=1.0, help="average pause between a session's workloads")
+    parser.add_argument('--seed-reports', type=int, default=200, help="reports stored before the run")
+    parser.add_argument('--output', help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = ReportStore(data_dir)
+        for n in range(args.seed_reports):
+            store.add_report({
+                'name': f"Seed {n}", 'contact': "09170000000", 'issue_type': "Pothole",
+                'location': f"Purok {n % 9}, Main Street", 'description': "Seeded report",
+                'status': 'Received', 'assigned_to': 'Not assigned',
+                'date_reported': time.strftime("%Y-%m-%d %H:%M"), 'comments': [], 'priority': 'Medium'
+            })
+        store.snapshot()
+
+        port = free_port()
+        server = start_server(data_dir, port)
+        try:
+            photo = sample_photo()
+            meter = CpuMeter(server.pid)
+            sessions = [(Session(f"c{n}", False, port, photo, random.Random(n), meter), CITIZEN_MIX)
+                        for n in range(args.citizens)]
+            sessions += [(Session(f"a{n}", True, port, photo, random.Random(1000 + n), meter), ADMIN_MIX)
+                         for n in range(args.admins)]
+            results, elapsed, cpu, rss_start, rss_samples = asyncio.run(
+                drive(sessions, args.duration, args.think, server.pid))
+
+            # Give the server's submission queue time to finish writing
+            submitted = [m for s, _ in sessions for m in s.submitted]
+            for _ in range(40):
+                final = ReportStore(data_dir)
+                descriptions = {}
+                for report in final.reports:
+                    descriptions.setdefault(report['description'], []).append(report['id'])
+                stored = {m: len(descriptions.get(f"Simulated report {m} from the load harness", [])) for m in submitted}
+                if all(stored.values()):
+                    break
+                time.sleep(0.5)
+            photos_missing = [m for s, _ in sessions for m in s.photos if stored[m]
+                              and not final.details(descriptions[f"Simulated report {m} from the load harness"][0])['photo']]
+            comments = [c for s, _ in sessions for c in s.comments]
+            stored_comments = {c['text'] for row in final.export_rows() for c in row['comments']}
+            missing_comments = [c for c in comments if c not in stored_comments]
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    workloads = {}
+    for action in sorted({r[0] for r in results}):
+        rows = [r for r in results if r[0] == action]
+        latencies = [t for r in rows for t in r[1]]
+        cpu_times = [t for r in rows for t in r[2]]
+        workloads[action] = {
+            'count': len(rows),
+            'errors': len([r for r in rows if r[3]]),
+            'per_second': len(rows) / elapsed,
+            'interactions': len(latencies),
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'max_ms': max(latencies, default=0) * 1000,
+            'cpu_ms_per_interaction': sum(cpu_times) / len(cpu_times) * 1000 if cpu_times else None
+        }
+    id_waits = [w for s, _ in sessions for w in s.id_waits]
+    errors = sorted({r[3] for r in results if r[3]})
+    interactions = sum(len(r[1]) for r in results)
+    summary = {
+        'sessions': {'citizens': args.citizens, 'admins': args.admins},
+        'duration_s': elapsed,
+        'interactions': interactions,
+        'interactions_per_second': interactions / elapsed,
+        'workloads': workloads,
+        'report_id_wait_ms': {
+            'count': len(id_waits),
+            'p50': percentile(id_waits, 0.50) * 1000,
+            'p99': percentile(id_waits, 0.99) * 1000,
+            'max': max(id_waits, default=0) * 1000
+        },
+        'server_cpu': {
+            'seconds': cpu,
+            'per_interaction_ms': cpu / interactions * 1000 if interactions else None,
+            'utilization': cpu / elapsed
+        } if cpu is not None else None,
+        'server_rss_mb': {
+            'start': rss_start / 2**20,
+            'peak': max(rss_samples) / 2**20,
+            'end': rss_samples[-1] / 2**20
+        } if rss_start is not None and rss_samples else None,
+        'integrity': {
+            'reports_submitted': len(submitted),
+            'reports_lost': len([m for m, n in stored.items() if n == 0]),
+            'reports_duplicated': len([m for m, n in stored.items() if n > 1]),
+            'photos_missing': len(photos_missing),
+            'comments_added': len(comments),
+            'comments_lost': len(missing_comments)
+        },
+        'errors': errors[:20]
+    }
+    summary['integrity']['ok'] = (summary['integrity']['reports_lost'] == 0
+                                  and summary['integrity']['reports_duplicated'] == 0
+                                  and summary['integrity']['photos_missing'] == 0
+                                  and summary['integrity']['comments_lost'] == 0)
+
+    output = json.dumps(summary, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    else:
+        print(output)
+    return 0 if summary['integrity']['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""Measure submit latency under a sustained burst of citizen reports.
+
+Submitters call the same SubmissionQueue the report form uses, at a fixed
+aggregate rate, with photos and a share of double taps. Two latencies are
+reported, per interval so any drift under sustained load is visible:
+
+    submit  how long the form takes to answer "received, processing"
+    saved   from submit until the report is written and has its ID; the
+            form's status check picks the ID up within a second after that
+
+--mode sync measures the old behaviour of encoding and writing inside the
+request instead, where both are the same.
+
+    python scripts/loadtest_submit.py --rate 50 --duration 30
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from communityfix_store import ReportStore, SubmissionQueue
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=['queued', 'sync'], default='queued')
+    parser.add_argument('--rate', type=float, default=50, help="submissions per second, all submitters together")
+    parser.add_argument('--duration', type=float, default=20, help="seconds")
+    parser.add_argument('--submitters', type=int, default=16)
+    parser.add_argument('--photo-kb', type=int, default=300)
+    parser.add_argument('--double-tap', type=float, default=0.2, help="share of submissions sent twice")
+    parser.add_argument('--interval', type=float, default=5, help="seconds per latency line")
+    parser.add_argument('--json', action='store_true', help="print the summary as JSON")
+    args = parser.parse_args()
+
+    photo = os.urandom(args.photo_kb * 1024)
+    lock = threading.Lock()
+    samples = []  # (offset from start, latency, outcome)
+    submitted_at = {}  # token -> (offset from start, time of first accepted submit)
+    saved_at = {}  # token -> time the report was written
+    tokens = set()
+    accepted = set()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = ReportStore(data_dir)
+        add_report = store.add_report
+
+        def timed_add_report(report, token=None):
+            report_id = add_report(report, token=token)
+            with lock:
+                saved_at.setdefault(token, time.monotonic())
+            return report_id
+
+        store.add_report = timed_add_report
+        submissions = SubmissionQueue(store)
+
+        def submit(token, report):
+            if args.mode == 'sync':
+                report['photo'] = base64.b64encode(photo).decode()
+                timed_add_report(report, token=token)
+                return 'saved'
+            return submissions.submit(token, report, photo)
+
+        def submitter(n, start):
+            rng = random.Random(n)
+            period = args.submitters / args.rate
+            due = start + rng.random() * period
+            count = 0
+            while due < start + args.duration:
+                time.sleep(max(0.0, due - time.monotonic()))
+                token = uuid.uuid4().hex
+                report = {
+                    'name': f"Resident {n}-{count}",
+                    'contact': f"09{n:03d}{count:06d}",  # one contact per report stays under the rate limit
+                    'issue_type': "Clogged Drainage",
+                    'location': f"Purok {count % 9}, flooded street",
+                    'description': "Water is rising quickly after the storm",
+                    'status': 'Received',
+                    'assigned_to': 'Not assigned',
+                    'date_reported': time.strftime("%Y-%m-%d %H:%M"),
+                    'comments': [],
+                    'priority': 'High'
+                }
+                taps = 2 if rng.random() < args.double_tap else 1
+                for _ in range(taps):
+                    began = time.monotonic()
+                    outcome = submit(token, dict(report))
+                    with lock:
+                        samples.append((began - start, time.monotonic() - began, outcome))
+                        tokens.add(token)
+                        if outcome in ('queued', 'saved'):
+                            accepted.add(token)
+                            submitted_at.setdefault(token, (began - start, began))
+                count += 1
+                due += period
+
+        start = time.monotonic()
+        threads = [threading.Thread(target=submitter, args=(n, start)) for n in range(args.submitters)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        submitted_for = time.monotonic() - start
+        submissions._queue.join()
+        drained_after = time.monotonic() - start
+
+        stored = ReportStore(data_dir)
+        stored_count = len(stored.reports)
+
+    outcomes = {}
+    for _, _, outcome in samples:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    # (offset from start, submit-to-saved time) per accepted report
+    saved = [(at, saved_at[token] - began) for token, (at, began) in submitted_at.items() if token in saved_at]
+    intervals = []
+    for i in range(int(args.duration // args.interval)):
+        window = [lat for at, lat, _ in samples if i * args.interval <= at < (i + 1) * args.interval]
+        saved_window = [lat for at, lat in saved if i * args.interval <= at < (i + 1) * args.interval]
+        intervals.append({
+            'from_s': i * args.interval,
+            'submits': len(window),
+            'p50_ms': percentile(window, 0.50) * 1000,
+            'p99_ms': percentile(window, 0.99) * 1000,
+            'saved_p50_ms': percentile(saved_window, 0.50) * 1000,
+            'saved_p99_ms': percentile(saved_window, 0.99) * 1000
+        })
+    latencies = [lat for _, lat, _ in samples]
+    saved_latencies = [lat for _, lat in saved]
+    summary = {
+        'mode': args.mode,
+        'target_rate': args.rate,
+        'achieved_rate': len(samples) / submitted_for,
+        'submits': len(samples),
+        'outcomes': outcomes,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': max(latencies, default=0) * 1000,
+        'saved_p50_ms': percentile(saved_latencies, 0.50) * 1000,
+        'saved_p99_ms': percentile(saved_latencies, 0.99) * 1000,
+        'saved_max_ms': max(saved_latencies, default=0) * 1000,
+        'drained_after_s': drained_after,
+        'unique_reports': len(tokens),
+        'stored_reports': stored_count,
+        'accepted_reports': len(accepted),
+        'duplicates_stored': stored_count - len(accepted),
+        'intervals': intervals
+    }
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f"mode={args.mode} rate={summary['achieved_rate']:.1f}/s submits={len(samples)} outcomes={outcomes}")
+    for row in intervals:
+        print(f"  {row['from_s']:5.0f}s  n={row['submits']:5d}  submit p50={row['p50_ms']:7.2f}ms p99={row['p99_ms']:7.2f}ms"
+              f"  saved p50={row['saved_p50_ms']:8.1f}ms p99={row['saved_p99_ms']:8.1f}ms")
+    print(f"submit p50={summary['p50_ms']:.2f}ms p99={summary['p99_ms']:.2f}ms max={summary['max_ms']:.2f}ms")
+    print(f"saved  p50={summary['saved_p50_ms']:.1f}ms p99={summary['saved_p99_ms']:.1f}ms max={summary['saved_max_ms']:.1f}ms")
+    print(f"unique reports={len(tokens)} accepted={len(accepted)} stored={stored_count} duplicates stored={summary['duplicates_stored']} "
+          f"queue drained after {drained_after:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Check that reports written by one worker reach the other workers quickly.
+
+Starts several worker processes on one shared data directory. One of them
+submits reports while the others poll ReportStore.refresh() the same way the
+app does on every rerun. Prints the propagation delay of every report and
+exits non-zero if any report was lost or arrived later than --max-delay.
+
+    python scripts/multiworker_harness.py --workers 4 --reports 200
+"""
+import argparse
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from communityfix_store import ReportStore
+
+
+def sample_report(n):
+    return {
+        'name': f"Resident {n}",
+        'contact': "09171234567",
+        'issue_type': "Pothole",
+        'location': f"Purok {n % 7}, Main Street",
+        'description': "Deep pothole near the corner, dangerous at night",
+        'status': 'Received',
+        'assigned_to': 'Not assigned',
+        'date_reported': time.strftime("%Y-%m-%d %H:%M"),
+        'comments': [],
+        'photo': None,
+        'priority': 'Medium'
+    }
+
+
+def submitter(data_dir, count, interval, events):
+    store = ReportStore(data_dir)
+    for n in range(count):
+        report_id = store.add_report(sample_report(n))
+        events.put(('sent', report_id, time.time()))
+        time.sleep(interval)
+
+
+def reader(worker, data_dir, count, poll, deadline, ready, events):
+    store = ReportStore(data_dir)
+    seen = {r['id'] for r in store.reports}
+    ready.wait()
+    stop_at = time.time() + deadline
+    while len(seen) < count and time.time() < stop_at:
+        if store.refresh():
+            now = time.time()
+            for report in store.reports:
+                if report['id'] not in seen:
+                    seen.add(report['id'])
+                    events.put(('seen', report['id'], now, worker))
+        time.sleep(poll)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=3, help="reader workers besides the submitter")
+    parser.add_argument('--reports', type=int, default=100)
+    parser.add_argument('--interval', type=float, default=0.01, help="seconds between submissions")
+    parser.add_argument('--poll', type=float, default=0.05, help="seconds between reader refreshes")
+    parser.add_argument('--max-delay', type=float, default=1.0, help="allowed propagation delay in seconds")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        ReportStore(data_dir)  # create the data directory layout up front
+        events = multiprocessing.Queue()
+        ready = multiprocessing.Barrier(args.workers + 1)
+        deadline = args.reports * args.interval + args.max_delay * 5
+        readers = [multiprocessing.Process(target=reader,
+                                           args=(w, data_dir, args.reports, args.poll, deadline, ready, events))
+                   for w in range(args.workers)]
+        for p in readers:
+            p.start()
+        ready.wait()  # every reader has loaded the store before the first submission
+        writer = multiprocessing.Process(target=submitter, args=(data_dir, args.reports, args.interval, events))
+        writer.start()
+
+        sent, seen = {}, {}
+        expected = args.reports * (args.workers + 1)
+        received = 0
+        while received < expected and (writer.is_alive() or any(p.is_alive() for p in readers) or not events.empty()):
+            try:
+                event = events.get(timeout=0.5)
+            except Exception:
+                continue
+            received += 1
+            if event[0] == 'sent':
+                sent[event[1]] = event[2]
+            else:
+                seen[(event[3], event[1])] = event[2]
+        writer.join()
+        for p in readers:
+            p.join()
+
+    delays = sorted(seen[key] - sent[key[1]] for key in seen if key[1] in sent)
+    missing = args.reports * args.workers - len(seen)
+    worst = delays[-1] if delays else float('inf')
+    print(f"workers={args.workers + 1} reports={len(sent)} deliveries={len(seen)} missing={missing}")
+    if delays:
+        print(f"delay p50={delays[len(delays) // 2] * 1000:.1f}ms "
+              f"p99={delays[int(len(delays) * 0.99) - 1] * 1000:.1f}ms max={worst * 1000:.1f}ms")
+    ok = missing == 0 and len(sent) == args.reports and worst <= args.max_delay
+    print("PASS" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
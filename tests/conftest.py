@@ -0,0 +1,33 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from communityfix_store import ReportStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ReportStore(tmp_path)
+
+
+@pytest.fixture
+def make_report():
+    def make(n=0, **fields):
+        report = {
+            'name': f"Juan {n}",
+            'contact': "09171234567",
+            'issue_type': "Pothole",
+            'location': f"Purok {n}, Main Street",
+            'description': f"Pothole number {n} near the hall",
+            'status': 'Received',
+            'assigned_to': 'Not assigned',
+            'date_reported': "2025-10-01 09:00",
+            'comments': [],
+            'priority': 'Medium'
+        }
+        report.update(fields)
+        return report
+    return make
@@ -0,0 +1,127 @@
+import communityfix_format as fmt
+from communityfix_store import AnalyticsCube, ReportStore
+
+
+def assert_same_aggregates(kept, fresh):
+    assert kept.seq == fresh.seq
+    assert kept.status == fresh.status
+    assert kept.by_issue == fresh.by_issue
+    assert kept.daily == fresh.daily
+    assert kept.resolved_at == fresh.resolved_at
+
+
+def test_changes_since_returns_the_changes_after_seq(store, make_report):
+    first = store.add_report(make_report(1))
+    seq = store.seq
+    store.update_report(first, status='Resolved')
+    store.add_comment(first, "Fixed")
+
+    changes = store.changes_since(seq)
+    assert [(c['op'], c['id']) for c in changes] == [('put', first), ('comment', first)]
+    assert changes[0]['previous']['status'] == 'Received'
+    assert changes[0]['report']['status'] == 'Resolved'
+    assert store.changes_since(store.seq) == []
+
+
+def test_changes_since_is_none_once_the_feed_rolled_over(tmp_path, monkeypatch, make_report):
+    monkeypatch.setattr('communityfix_store.FEED_SIZE', 3)
+    store = ReportStore(tmp_path)
+    for n in range(5):
+        store.add_report(make_report(n))
+
+    assert store.changes_since(1) is None
+    assert [c['seq'] for c in store.changes_since(2)] == [3, 4, 5]
+
+
+def test_changes_since_is_none_after_a_snapshot_reload(tmp_path, monkeypatch, store, make_report):
+    monkeypatch.setattr('communityfix_store.COMPACT_EVERY', 3)
+    other = ReportStore(tmp_path)
+    other.add_report(make_report(0))
+    seq = other.seq
+    for n in range(1, 5):
+        store.add_report(make_report(n))
+
+    assert other.refresh()
+    assert other.changes_since(seq) is None
+    assert other.changes_since(other.seq) == []
+
+
+def test_aggregates_kept_by_changes_match_a_fresh_count(tmp_path, store, make_report):
+    for n in range(6):
+        store.add_report(make_report(n, issue_type=["Pothole", "Graffiti"][n % 2],
+                                     date_reported=f"2025-0{n % 3 + 1}-10 09:00"))
+    kept = store.aggregates()
+    other = ReportStore(tmp_path)
+
+    store.update_report(1, status='Resolved')
+    store.update_report(2, status='In Progress', issue_type="Water Leak")
+    store.add_report(make_report(7, status='Resolved'))
+    store.update_report(1, status='In Progress')
+    store.add_comment(3, "Checked")
+    for change in store.changes_since(kept.seq):
+        kept.apply(change)
+    assert_same_aggregates(kept, store.aggregates())
+
+    # The same changes read by another worker from the journal
+    kept = other.aggregates()
+    assert other.refresh()
+    for change in other.changes_since(kept.seq):
+        kept.apply(change)
+    assert_same_aggregates(kept, other.aggregates())
+    assert kept.status == {'Received': 4, 'In Progress': 2, 'Resolved': 1}
+
+
+def test_cube_kept_by_writes_matches_a_recount(tmp_path, store, make_report):
+    other = ReportStore(tmp_path)
+    for n in range(8):
+        store.add_report(make_report(n, priority=["Low", "High"][n % 2],
+                                     date_reported=f"202{4 + n % 2}-1{n % 3}-05 12:00"))
+    store.update_report(2, status='Resolved', priority='Emergency')
+    store.update_report(5, issue_type="Graffiti")
+    store.update_report(2, status='In Progress')
+
+    assert store.cube.counts == AnalyticsCube.build(store.index).counts
+    assert other.refresh()
+    assert other.cube.counts == store.cube.counts
+    assert ReportStore(tmp_path).cube.counts == store.cube.counts
+
+
+def test_same_month_of_different_years_is_counted_apart(store, make_report):
+    store.add_report(make_report(1, date_reported="2024-10-03 08:00"))
+    store.add_report(make_report(2, date_reported="2025-10-03 08:00"))
+    store.add_report(make_report(3, date_reported="2025-10-20 08:00", status='Resolved'))
+
+    by_month = store.analytics().totals('month')
+    assert by_month['2025-10'] == 2
+    assert by_month['2024-10'] == 1
+    assert store.analytics().totals('month', status='Resolved') == {'2025-10': 1}
+
+
+def test_stale_cube_file_is_recounted(tmp_path, store, make_report):
+    for n in range(3):
+        store.add_report(make_report(n))
+    store.snapshot()
+    store.cube_file.write_bytes(fmt.encode({'seq': 1, 'cells': [["2025-10", "Pothole", "Medium", "Received", 99]]}))
+
+    assert ReportStore(tmp_path).cube.counts == {("2025-10", "Pothole", "Medium", "Received"): 3}
+
+
+def test_corrupted_cube_file_is_recounted(tmp_path, store, make_report):
+    for n in range(3):
+        store.add_report(make_report(n))
+    store.snapshot()
+    store.cube_file.write_bytes(store.cube_file.read_bytes()[:-7])
+
+    assert ReportStore(tmp_path).cube.counts == {("2025-10", "Pothole", "Medium", "Received"): 3}
+
+
+def test_rebuild_analytics_recounts_and_saves(tmp_path, store, make_report):
+    for n in range(3):
+        store.add_report(make_report(n))
+    store.cube.add(store.get(1))  # counts that drifted from the reports
+
+    store.rebuild_analytics()
+    assert store.cube.counts == AnalyticsCube.build(store.index).counts
+    saved, seq = AnalyticsCube.read(store.cube_file)
+    assert saved.counts == store.cube.counts
+    assert seq == store.seq
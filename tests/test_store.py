@@ -0,0 +1,194 @@
+import json
+
+import communityfix_format as fmt
+from communityfix_store import ReportStore
+
+
+def test_torn_journal_line_is_cut_off_by_next_commit(tmp_path, store, make_report):
+    store.add_report(make_report(1))
+    with open(store.journal_file, 'ab') as f:
+        f.write(b'{"op":"put","rep')  # a writer crashed mid-line
+
+    second = store.add_report(make_report(2))
+
+    reopened = ReportStore(tmp_path)
+    assert [r['id'] for r in reopened.reports] == [1, second]
+    assert reopened.seq == store.seq
+    assert store.journal_file.read_bytes().endswith(b'\n')
+
+
+def test_torn_journal_line_is_skipped_until_then(tmp_path, store, make_report):
+    store.add_report(make_report(1))
+    with open(store.journal_file, 'ab') as f:
+        f.write(b'{"op":"put","rep')
+
+    other = ReportStore(tmp_path)
+    assert [r['id'] for r in other.reports] == [1]
+    other.add_report(make_report(2))
+    assert store.refresh()
+    assert [r['id'] for r in store.reports] == [1, 2]
+
+
+def test_changes_reach_other_workers_through_the_journal(tmp_path, store, make_report):
+    other = ReportStore(tmp_path)
+    report_id = store.add_report(make_report(1))
+    store.update_report(report_id, status='In Progress', assigned_to="Team A")
+    store.add_comment(report_id, "On the way")
+
+    assert other.refresh()
+    assert other.get(report_id)['status'] == 'In Progress'
+    assert other.get(report_id)['assigned_to'] == "Team A"
+    assert [c['text'] for c in other.get(report_id)['comments']] == ["On the way"]
+    assert other.seq == store.seq
+    assert not other.refresh()
+
+
+def test_same_token_is_stored_once(store, make_report):
+    first = store.add_report(make_report(1), token="abc")
+    assert store.add_report(make_report(1), token="abc") == first
+    assert len(store.reports) == 1
+
+
+def test_compaction_restarts_journal_and_other_workers_catch_up(tmp_path, monkeypatch, store, make_report):
+    monkeypatch.setattr('communityfix_store.COMPACT_EVERY', 5)
+    other = ReportStore(tmp_path)
+    for n in range(12):
+        store.add_report(make_report(n))
+
+    # Two compactions happened; the journal only holds what came after the last one
+    assert len(store.journal_file.read_bytes().splitlines()) == 1 + 12 % 5
+    assert other.refresh()
+    assert [r['id'] for r in other.reports] == list(range(1, 13))
+    assert other.seq == store.seq == 12
+    assert ReportStore(tmp_path).seq == 12
+
+
+def test_reload_swaps_in_new_state_instead_of_clearing_it(tmp_path, monkeypatch, store, make_report):
+    monkeypatch.setattr('communityfix_store.COMPACT_EVERY', 3)
+    other = ReportStore(tmp_path)
+    other.add_report(make_report(0))
+    before = other.reports
+    for n in range(1, 7):
+        store.add_report(make_report(n))
+
+    # What a session reading without the lock would see while the snapshot loads
+    seen = []
+    record = other._record
+
+    def watch(row):
+        seen.append((len(other.reports), other.get(1) is not None))
+        return record(row)
+
+    monkeypatch.setattr(other, '_record', watch)
+    assert other.refresh()
+    assert seen and all(n >= 1 and found for n, found in seen)
+    assert [r['id'] for r in before] == [1]
+    assert [r['id'] for r in other.reports] == list(range(1, 8))
+    assert all(other.get(r['id']) is r for r in other.reports)
+
+
+def test_snapshot_keeps_everything(tmp_path, store, make_report):
+    report_id = store.add_report(make_report(1, photo="aGVsbG8="))
+    store.add_comment(report_id, "Noted")
+    store.snapshot()
+
+    reopened = ReportStore(tmp_path)
+    report = reopened.get(report_id)
+    assert report['description'] == "Pothole number 1 near the hall"
+    assert report['photo'] == "aGVsbG8="
+    assert [c['text'] for c in report['comments']] == ["Noted"]
+    assert reopened.cube.counts == store.cube.counts
+
+
+def test_legacy_json_file_is_upgraded(tmp_path, make_report):
+    legacy = dict(make_report(1), id=1, photo="aGVsbG8=",
+                  comments=[{'author': 'Admin', 'text': "Seen", 'timestamp': "2025-10-01 10:00"}])
+    (tmp_path / 'reports_data.json').write_text(json.dumps({'reports': [legacy], 'last_updated': None}))
+
+    store = ReportStore(tmp_path)
+    report = store.get(1)
+    assert report['name'] == "Juan 1"
+    assert report['photo'] == "aGVsbG8="
+    assert [c['text'] for c in report['comments']] == ["Seen"]
+    assert not (tmp_path / 'reports_data.json').exists()
+    assert (tmp_path / 'reports_data.v1.json').exists()
+    assert fmt.read_file(store.data_file)['reports'][0] == store.get(1).to_row()
+
+    store.add_comment(1, "Fixed")
+    reopened = ReportStore(tmp_path)
+    assert [c['text'] for c in reopened.get(1)['comments']] == ["Seen", "Fixed"]
+
+
+def test_details_inside_old_journal_entries_are_moved_out(tmp_path, make_report):
+    (tmp_path / 'reports_journal.jsonl').write_text(
+        json.dumps({'base_seq': 0}) + '\n' +
+        json.dumps({'op': 'put', 'seq': 1, 'report': dict(make_report(1), id=1)}) + '\n')
+
+    store = ReportStore(tmp_path)
+    assert store.get(1)['description'] == "Pothole number 1 near the hall"
+    assert 'description' not in fmt.read_file(store.data_file)['reports'][0]
+
+
+def test_export_rows_match_the_records(store, make_report):
+    first = store.add_report(make_report(1, photo="aGVsbG8="))
+    second = store.add_report(make_report(2))
+    store.add_comment(first, "Noted")
+
+    rows = store.export_rows()
+    assert rows == [dict(store.get(first)), dict(store.get(second))]
+    assert list(rows[0]) == list(store.get(first))
+    assert rows[0]['comments'][0]['text'] == "Noted"
+    assert rows[1]['comments'] == []
+
+
+def test_search_finds_words_by_their_start_newest_first(store, make_report):
+    for n in range(1, 6):
+        store.add_report(make_report(n))
+    store.add_report(make_report(6, name="Maria Santos", issue_type="Street Light", location="Purok 3, Rizal Ave"))
+
+    assert [r['id'] for r in store.search("main str")] == [5, 4, 3, 2, 1]
+    assert [r['id'] for r in store.search("PUROK 3")] == [6, 3]
+    assert [r['id'] for r in store.search("light san")] == [6]
+    assert [r['id'] for r in store.search("#4")] == [4]
+    assert [r['id'] for r in store.search("", limit=2)] == [6, 5]
+    assert store.search("street lamp") == []
+
+
+def test_search_follows_changes_and_reloads(tmp_path, store, make_report):
+    report_id = store.add_report(make_report(1))
+    store.update_report(report_id, location="Purok 7, Rizal Ave")
+
+    assert store.search("main") == []
+    assert [r['id'] for r in store.search("rizal")] == [report_id]
+    assert [r['id'] for r in ReportStore(tmp_path).search("rizal")] == [report_id]
+
+
+def test_select_gives_matching_ids_with_their_seq(tmp_path, monkeypatch, store, make_report):
+    monkeypatch.setattr('communityfix_store.COMPACT_EVERY', 3)
+    other = ReportStore(tmp_path)
+    for n in range(5):
+        store.add_report(make_report(n, status=['Received', 'Resolved'][n % 2]))
+
+    assert other.refresh()
+    assert other.select(lambda r: r.status == 'Resolved') == ([2, 4], 5)
+    assert other.changes_since(5) == []
+
+
+def test_restarted_journal_is_noticed_even_with_a_reused_inode(tmp_path, monkeypatch, store, make_report):
+    monkeypatch.setattr('communityfix_store.COMPACT_EVERY', 3)
+    other = ReportStore(tmp_path)
+    for n in range(2):
+        store.add_report(make_report(n))
+    assert other.refresh()
+    for n in range(2, 6):
+        store.add_report(make_report(n))
+    for n in range(6, 8):
+        store.add_report(make_report(n, location="Purok 6, along the long road behind the old market " * 3))
+
+    # Two compactions later the new journal is longer than what `other` read
+    # of the old one; pretend the filesystem gave it the old inode number
+    assert store.journal_file.stat().st_size > other._journal_offset
+    other._journal_stat = (store.journal_file.stat().st_ino,) + other._journal_stat[1:]
+    assert other.refresh()
+    assert [r['id'] for r in other.reports] == list(range(1, 9))
+    assert other.seq == store.seq == 8
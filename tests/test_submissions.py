@@ -0,0 +1,104 @@
+import base64
+import threading
+import time
+
+from communityfix_store import MAX_PHOTO_BYTES, SubmissionQueue
+
+
+def blocked(monkeypatch, store):
+    """Hold the writer thread until the returned event is set"""
+    release = threading.Event()
+    add_report = store.add_report
+    monkeypatch.setattr(store, 'add_report', lambda report, token=None: release.wait() and add_report(report, token=token))
+    return release
+
+
+def test_same_token_is_queued_once(store, make_report):
+    submissions = SubmissionQueue(store)
+
+    assert submissions.submit('t', make_report(1)) == 'queued'
+    assert submissions.submit('t', make_report(1)) == 'duplicate'
+    assert submissions.result('t', timeout=5) == {'status': 'saved', 'report_id': 1}
+    assert submissions.submit('t', make_report(1)) == 'duplicate'
+    assert submissions.result('unknown') is None
+    assert len(store.reports) == 1
+
+
+def test_rate_limit_counts_per_contact_number(store, make_report):
+    submissions = SubmissionQueue(store, rate_limit=2, rate_window=60)
+
+    assert submissions.submit('a', make_report(1, contact="0917 123 4567")) == 'queued'
+    assert submissions.submit('b', make_report(2, contact="0917-123-4567")) == 'queued'
+    assert submissions.submit('c', make_report(3, contact="09171234567")) == 'rate_limited'
+    assert submissions.submit('d', make_report(4, contact="09181234567")) == 'queued'
+    assert submissions.result('c') is None
+
+
+def test_rate_limit_window_passes(monkeypatch, store, make_report):
+    now = [1000.0]
+    monkeypatch.setattr('communityfix_store.time.monotonic', lambda: now[0])
+    submissions = SubmissionQueue(store, rate_limit=1, rate_window=60)
+
+    assert submissions.submit('a', make_report(1)) == 'queued'
+    assert submissions.submit('b', make_report(2)) == 'rate_limited'
+    now[0] += 61
+    assert submissions.submit('b', make_report(2)) == 'queued'
+
+
+def test_full_queue_is_busy_until_the_writer_catches_up(monkeypatch, store, make_report):
+    release = blocked(monkeypatch, store)
+    submissions = SubmissionQueue(store, maxsize=1)
+
+    assert submissions.submit('a', make_report(1, contact="0917000001")) == 'queued'
+    # The writer takes 'a' off the queue and waits; 'b' fills the one slot
+    while submissions.pending():
+        time.sleep(0.01)
+    assert submissions.submit('b', make_report(2, contact="0917000002")) == 'queued'
+    assert submissions.submit('c', make_report(3, contact="0917000003")) == 'busy'
+    assert submissions.pending() == 1
+
+    release.set()
+    assert submissions.result('b', timeout=5)['status'] == 'saved'
+    assert submissions.submit('c', make_report(3, contact="0917000003")) == 'queued'
+    assert submissions.result('c', timeout=5)['status'] == 'saved'
+    assert len(store.reports) == 3
+
+
+
+def test_failed_submission_can_be_sent_again(monkeypatch, store, make_report):
+    add_report = store.add_report
+    calls = []
+
+    def fail_once(report, token=None):
+        calls.append(token)
+        if len(calls) == 1:
+            raise OSError("disk full")
+        return add_report(report, token=token)
+
+    monkeypatch.setattr(store, 'add_report', fail_once)
+    submissions = SubmissionQueue(store)
+
+    assert submissions.submit('t', make_report(1)) == 'queued'
+    assert submissions.result('t', timeout=5) == {'status': 'failed', 'error': "disk full"}
+    assert submissions.submit('t', make_report(1)) == 'queued'
+    assert submissions.result('t', timeout=5) == {'status': 'saved', 'report_id': 1}
+    assert submissions.submit('t', make_report(1)) == 'duplicate'
+    assert len(store.reports) == 1
+
+
+def test_photo_bytes_bound_the_queue(monkeypatch, store, make_report):
+    release = blocked(monkeypatch, store)
+    submissions = SubmissionQueue(store, max_bytes=2 * MAX_PHOTO_BYTES)
+    photo = b'x' * MAX_PHOTO_BYTES
+
+    assert submissions.submit('big', make_report(0, contact="0917000000"), b'x' * (MAX_PHOTO_BYTES + 1)) == 'too_large'
+    assert submissions.submit('a', make_report(1, contact="0917000001"), photo) == 'queued'
+    assert submissions.submit('b', make_report(2, contact="0917000002"), photo) == 'queued'
+    assert submissions.submit('c', make_report(3, contact="0917000003"), photo) == 'busy'
+    assert submissions.submit('d', make_report(4, contact="0917000004")) == 'queued'
+
+    release.set()
+    assert submissions.result('d', timeout=5)['status'] == 'saved'
+    assert submissions.submit('c', make_report(3, contact="0917000003"), photo) == 'queued'
+    assert submissions.result('c', timeout=5)['status'] == 'saved'
+    assert base64.b64decode(store.get(submissions.result('c')['report_id'])['photo']) == photo